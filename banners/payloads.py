@@ -0,0 +1,32 @@
+from django.core.cache import cache
+
+from foodcartapp.cache_versions import get_version
+from foodcartapp.thumbnails import get_srcsets
+
+from .models import Banner
+from .serializers import BannerSerializer
+
+
+BANNERS_VERSION = 'banners'
+BANNERS_CACHE_TIMEOUT = 24 * 60 * 60
+BANNER_IMAGE_WIDTHS = (480, 960, 1440)
+
+
+def serialize_banners(slug):
+    banners = Banner.objects.filter(place__slug=slug)
+    dumped_banners = []
+    for banner in banners:
+        dumped_banner = dict(BannerSerializer(banner).data)
+        dumped_banner['srcset'] = get_srcsets(banner.image, BANNER_IMAGE_WIDTHS)
+        dumped_banners.append(dumped_banner)
+    return dumped_banners
+
+
+def get_banners_payload(slug):
+    version = get_version(BANNERS_VERSION)
+    cache_key = f'banners:payload:{version}:{slug}'
+    payload = cache.get(cache_key)
+    if payload is None:
+        payload = serialize_banners(slug)
+        cache.set(cache_key, payload, timeout=BANNERS_CACHE_TIMEOUT)
+    return payload
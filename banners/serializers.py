@@ -0,0 +1,7 @@
+from rest_framework import serializers
+
+
+class BannerSerializer(serializers.Serializer):
+    title = serializers.CharField(max_length=50)
+    src = serializers.URLField(source='image.url')
+    text = serializers.CharField()
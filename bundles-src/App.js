@@ -138,6 +138,12 @@ class App extends Component {
   }
 
   componentDidMount(){
+    const startPageData = document.getElementById('start-page-data');
+    if (startPageData){
+      const {products, banners} = JSON.parse(startPageData.textContent);
+      this.setState({products, banners});
+      return;
+    }
     this.getProducts();
     this.getBanners();
   }
@@ -0,0 +1,130 @@
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class GeocoderUnavailable(requests.RequestException):
+    pass
+
+
+class CircuitBreaker:
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def allow_request(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+                return True
+            # В полуоткрытом состоянии пропускаем только один пробный запрос
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+class GeocoderClient:
+    def __init__(self, base_url, timeout, max_retries, backoff,
+                 breaker, pool_size=10):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.breaker = breaker
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'requests': 0,
+            'errors': 0,
+            'retries': 0,
+            'rejected': 0,
+            'latency_total': 0.0,
+            'latency_max': 0.0,
+        }
+
+    def get_stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['latency_avg'] = (
+            stats['latency_total'] / stats['requests'] if stats['requests'] else 0.0
+        )
+        stats['breaker_state'] = self.breaker.state
+        return stats
+
+    def _count(self, counter):
+        with self._stats_lock:
+            self._stats[counter] += 1
+
+    def _send(self, params):
+        started_at = time.monotonic()
+        try:
+            return self.session.get(self.base_url, params=params, timeout=self.timeout)
+        finally:
+            latency = time.monotonic() - started_at
+            with self._stats_lock:
+                self._stats['requests'] += 1
+                self._stats['latency_total'] += latency
+                self._stats['latency_max'] = max(self._stats['latency_max'], latency)
+
+    def get_json(self, params):
+        if not self.breaker.allow_request():
+            self._count('rejected')
+            raise GeocoderUnavailable('Геокодер временно недоступен')
+
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self._count('retries')
+                time.sleep(random.uniform(0, self.backoff * 2 ** attempt))
+            try:
+                response = self._send(params)
+            except requests.RequestException as error:
+                self._count('errors')
+                last_error = error
+                continue
+            if response.status_code in RETRY_STATUS_CODES:
+                self._count('errors')
+                last_error = requests.HTTPError(response=response)
+                continue
+            try:
+                response.raise_for_status()
+            except requests.HTTPError:
+                self._count('errors')
+                self.breaker.record_success()
+                raise
+            self.breaker.record_success()
+            return response.json()
+
+        self.breaker.record_failure()
+        raise last_error
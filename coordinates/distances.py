@@ -0,0 +1,55 @@
+import numpy as np
+from geopy import distance
+
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def pack_coordinates(coordinates):
+    packed = np.full((len(coordinates), 2), np.nan)
+    for index, point in enumerate(coordinates):
+        if point:
+            packed[index] = point
+    return np.radians(packed)
+
+
+def _haversine(origin_lats, origin_lons, destination_lats, destination_lons):
+    hav = (
+        np.sin((destination_lats - origin_lats) / 2) ** 2
+        + np.cos(origin_lats) * np.cos(destination_lats)
+        * np.sin((destination_lons - origin_lons) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(hav, 0, 1)))
+
+
+def haversine_distances(origin, packed_destinations):
+    origin_lat, origin_lon = np.radians(np.array(origin, dtype=float))
+    return _haversine(
+        origin_lat,
+        origin_lon,
+        packed_destinations[:, 0],
+        packed_destinations[:, 1],
+    )
+
+
+def haversine_matrix(packed_origins, packed_destinations):
+    return _haversine(
+        packed_origins[:, 0, np.newaxis],
+        packed_origins[:, 1, np.newaxis],
+        packed_destinations[np.newaxis, :, 0],
+        packed_destinations[np.newaxis, :, 1],
+    )
+
+
+def refine_nearest(origins, destinations, distances, k):
+    """Уточняет геодезической формулой k ближайших расстояний в каждой строке матрицы."""
+    distances = np.array(distances, dtype=float)
+    if not k or not distances.size:
+        return distances
+    nearest = np.argsort(distances, axis=1, kind='stable')[:, :k]
+    for row, columns in enumerate(nearest):
+        for column in columns:
+            if np.isnan(distances[row, column]):
+                break
+            distances[row, column] = distance.distance(origins[row], destinations[column]).km
+    return distances
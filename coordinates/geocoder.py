@@ -0,0 +1,206 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .client import CircuitBreaker, GeocoderClient, GeocoderUnavailable
+from .models import Place, GeocodingTask
+from .signals import addresses_requested, places_updated
+
+
+_geocoder_client = None
+_geocoder_client_lock = threading.Lock()
+
+
+def get_geocoder_client():
+    global _geocoder_client
+    with _geocoder_client_lock:
+        if _geocoder_client is None:
+            _geocoder_client = GeocoderClient(
+                base_url=settings.GEOCODER_URL,
+                timeout=settings.GEOCODER_TIMEOUT,
+                max_retries=settings.GEOCODER_MAX_RETRIES,
+                backoff=settings.GEOCODER_RETRY_BACKOFF,
+                breaker=CircuitBreaker(
+                    failure_threshold=settings.GEOCODER_BREAKER_THRESHOLD,
+                    reset_timeout=settings.GEOCODER_BREAKER_RESET_TIMEOUT,
+                ),
+                pool_size=settings.GEOCODER_MAX_WORKERS,
+            )
+        return _geocoder_client
+
+
+def fetch_coordinates(address):
+    response = get_geocoder_client().get_json({
+        "geocode": address,
+        "apikey": settings.YANDEX_GEOCODER_KEY,
+        "format": "json",
+    })
+    found_places = response['response']['GeoObjectCollection']['featureMember']
+
+    if not found_places:
+        return None
+
+    most_relevant = found_places[0]
+    lon, lat = most_relevant['GeoObject']['Point']['pos'].split(" ")
+    return lon, lat
+
+
+FETCHED = 'fetched'
+FAILED = 'failed'
+SKIPPED = 'skipped'
+
+
+def _fetch_coordinates_safely(address):
+    try:
+        return FETCHED, fetch_coordinates(address)
+    except GeocoderUnavailable:
+        # Запрос не отправлялся: геокодер отключён автоматом, попытку не считаем
+        return SKIPPED, None
+    except requests.RequestException:
+        return FAILED, None
+
+
+def _get_coordinates_for_places(places):
+    return {
+        address: place.coordinates
+        for address, place in places.items()
+        if place.is_fresh()
+    }
+
+
+def get_known_coordinates(addresses):
+    addresses = {address for address in addresses if address}
+    known_places = Place.objects.in_bulk(addresses, field_name='address')
+    return _get_coordinates_for_places(known_places)
+
+
+def geocode_addresses(addresses):
+    """Возвращает координаты найденных адресов и адреса, до геокодера не дошедшие."""
+    addresses = {address for address in addresses if address}
+    known_places = Place.objects.in_bulk(addresses, field_name='address')
+    coordinates_for_address = _get_coordinates_for_places(known_places)
+
+    unresolved_addresses = sorted(addresses - coordinates_for_address.keys())
+    if not unresolved_addresses:
+        return coordinates_for_address, set()
+
+    max_workers = min(settings.GEOCODER_MAX_WORKERS, len(unresolved_addresses))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        fetch_results = executor.map(
+            _fetch_coordinates_safely,
+            unresolved_addresses
+        )
+        fetch_result_for_address = dict(zip(unresolved_addresses, fetch_results))
+
+    places_to_create = []
+    places_to_update = []
+    skipped_addresses = set()
+    now = timezone.now()
+    for address, (fetch_status, coordinates) in fetch_result_for_address.items():
+        if fetch_status == SKIPPED:
+            skipped_addresses.add(address)
+        if fetch_status != FETCHED:
+            continue
+        place = known_places.get(address)
+        if place:
+            places_to_update.append(place)
+        else:
+            place = Place(address=address)
+            places_to_create.append(place)
+        place.set_coordinates(coordinates, now)
+        coordinates_for_address[address] = place.coordinates
+
+    with transaction.atomic():
+        Place.objects.bulk_create(places_to_create, ignore_conflicts=True)
+        Place.objects.bulk_update(
+            places_to_update,
+            ['lon', 'lat', 'fetched_at', 'expires_at']
+        )
+        places_updated.send(
+            sender=Place,
+            addresses={place.address for place in places_to_create + places_to_update},
+        )
+    return coordinates_for_address, skipped_addresses
+
+
+def enqueue_addresses(addresses):
+    addresses = {address for address in addresses if address}
+    known_addresses = set(
+        Place.objects
+        .fresh()
+        .filter(address__in=addresses)
+        .values_list('address', flat=True)
+    )
+    GeocodingTask.objects.bulk_create(
+        [GeocodingTask(address=address) for address in addresses - known_addresses],
+        ignore_conflicts=True,
+    )
+
+
+def requeue_stale_addresses():
+    # Адрес, который не нашёлся или не геокодировался из-за сбоя, снова
+    # попадает в очередь, как только его место в кэше устареет
+    addresses = set()
+    for _, requested_addresses in addresses_requested.send(sender=Place):
+        addresses.update(requested_addresses)
+    enqueue_addresses(addresses)
+
+
+def claim_geocoding_tasks(batch_size):
+    # Задачи помечаются взятыми в короткой транзакции, чтобы не держать
+    # блокировки строк, пока идут запросы к геокодеру. Если воркер упадёт,
+    # задачи вернутся в очередь по истечении срока
+    now = timezone.now()
+    with transaction.atomic():
+        tasks = list(
+            GeocodingTask.objects
+            .select_for_update(skip_locked=True)
+            .filter(Q(claimed_until__isnull=True) | Q(claimed_until__lte=now))
+            .order_by('created_at')[:batch_size]
+        )
+        GeocodingTask.objects.filter(id__in=[task.id for task in tasks]).update(
+            claimed_until=now + timedelta(seconds=settings.GEOCODER_CLAIM_TIMEOUT)
+        )
+    return tasks
+
+
+def process_geocoding_tasks(batch_size):
+    tasks = claim_geocoding_tasks(batch_size)
+    if not tasks:
+        return 0
+    coordinates_for_address, skipped_addresses = geocode_addresses(
+        task.address for task in tasks
+    )
+    resolved_task_ids = [
+        task.id for task in tasks
+        if task.address in coordinates_for_address
+    ]
+    failed_task_ids = [
+        task.id for task in tasks
+        if task.address not in coordinates_for_address
+        and task.address not in skipped_addresses
+    ]
+    with transaction.atomic():
+        GeocodingTask.objects.filter(id__in=resolved_task_ids).delete()
+        GeocodingTask.objects.filter(id__in=failed_task_ids).update(
+            attempts=F('attempts') + 1
+        )
+        GeocodingTask.objects.filter(
+            id__in=[task.id for task in tasks],
+        ).update(claimed_until=None)
+        # Сбой геокодера не значит, что адрес не найдётся: не удаляем задачу,
+        # а откладываем её, чтобы не тратить попытки во время аварии
+        GeocodingTask.objects.filter(
+            id__in=failed_task_ids,
+            attempts__gte=settings.GEOCODER_MAX_ATTEMPTS,
+        ).update(
+            attempts=0,
+            claimed_until=timezone.now() + timedelta(seconds=settings.GEOCODER_RETRY_DELAY),
+        )
+    return len(resolved_task_ids)
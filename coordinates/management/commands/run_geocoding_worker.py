@@ -0,0 +1,65 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from coordinates.geocoder import (
+    get_geocoder_client,
+    process_geocoding_tasks,
+    requeue_stale_addresses,
+)
+
+
+class Command(BaseCommand):
+    help = 'Геокодирует адреса из очереди GeocodingTask'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.GEOCODER_MAX_WORKERS * 4,
+            help='Сколько адресов брать из очереди за раз',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=1,
+            help='Пауза в секундах, если в очереди нечего разрешить',
+        )
+        parser.add_argument(
+            '--max-sleep',
+            type=float,
+            default=60,
+            help='Предел паузы: пока адреса не разрешаются, пауза удваивается до него',
+        )
+        parser.add_argument(
+            '--sweep-interval',
+            type=float,
+            default=5 * 60,
+            help='Как часто в секундах ставить в очередь адреса с устаревшими координатами',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Разобрать очередь и завершиться',
+        )
+
+    def handle(self, *args, **options):
+        sleep = options['sleep']
+        swept_at = None
+        while True:
+            if swept_at is None or time.monotonic() - swept_at >= options['sweep_interval']:
+                requeue_stale_addresses()
+                swept_at = time.monotonic()
+            resolved_tasks = process_geocoding_tasks(options['batch_size'])
+            if resolved_tasks:
+                self.stdout.write(f'Обработано адресов: {resolved_tasks}')
+                if options['verbosity'] > 1:
+                    self.stdout.write(f'Геокодер: {get_geocoder_client().get_stats()}')
+                sleep = options['sleep']
+                continue
+            if options['once']:
+                return
+            # Очередь пуста или геокодер недоступен: не молотим его впустую
+            time.sleep(sleep)
+            sleep = min(sleep * 2, options['max_sleep'])
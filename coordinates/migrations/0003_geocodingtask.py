@@ -0,0 +1,27 @@
+# Generated by Django 4.0.5 on 2026-10-18 18:50
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coordinates', '0002_auto_20220529_2128'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeocodingTask',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('address', models.CharField(max_length=100, unique=True, verbose_name='адрес')),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='поставлен в очередь')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='попыток геокодирования')),
+            ],
+            options={
+                'verbose_name': 'адрес в очереди геокодирования',
+                'verbose_name_plural': 'адреса в очереди геокодирования',
+            },
+        ),
+    ]
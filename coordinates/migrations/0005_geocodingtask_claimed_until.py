@@ -0,0 +1,18 @@
+# Generated by Django 4.0.5 on 2026-10-18 19:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coordinates', '0004_place_expires_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='geocodingtask',
+            name='claimed_until',
+            field=models.DateTimeField(blank=True, db_index=True, null=True, verbose_name='взят в работу до'),
+        ),
+    ]
@@ -1,7 +1,19 @@
+from datetime import timedelta
+
+from django.conf import settings
 from django.db import models
+from django.db.models import Q
 from django.utils import timezone
 
 
+class PlaceQuerySet(models.QuerySet):
+    def fresh(self):
+        return self.filter(
+            Q(lat__isnull=False, lon__isnull=False)
+            | Q(expires_at__gt=timezone.now())
+        )
+
+
 class Place(models.Model):
     address = models.CharField(
         'адрес',
@@ -26,6 +38,14 @@ class Place(models.Model):
         'Дата записи координат',
         default=timezone.now
     )
+    expires_at = models.DateTimeField(
+        'Адрес не найден, повторить поиск после',
+        null=True,
+        blank=True,
+        db_index=True
+    )
+
+    objects = PlaceQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'место'
@@ -33,3 +53,55 @@ class Place(models.Model):
 
     def __str__(self):
         return f'{self.address}: {self.lon}, {self.lat}'
+
+    @property
+    def coordinates(self):
+        if self.lat is None or self.lon is None:
+            return None
+        return self.lat, self.lon
+
+    def is_fresh(self):
+        if self.coordinates:
+            return True
+        return bool(self.expires_at and self.expires_at > timezone.now())
+
+    def set_coordinates(self, coordinates, fetched_at):
+        self.fetched_at = fetched_at
+        if coordinates:
+            self.lon, self.lat = coordinates
+            self.expires_at = None
+        else:
+            self.lon = self.lat = None
+            self.expires_at = fetched_at + timedelta(
+                seconds=settings.GEOCODER_NEGATIVE_CACHE_TTL
+            )
+
+
+class GeocodingTask(models.Model):
+    address = models.CharField(
+        'адрес',
+        max_length=100,
+        unique=True
+    )
+    created_at = models.DateTimeField(
+        'поставлен в очередь',
+        default=timezone.now,
+        db_index=True
+    )
+    attempts = models.PositiveSmallIntegerField(
+        'попыток геокодирования',
+        default=0
+    )
+    claimed_until = models.DateTimeField(
+        'не брать из очереди до',
+        null=True,
+        blank=True,
+        db_index=True
+    )
+
+    class Meta:
+        verbose_name = 'адрес в очереди геокодирования'
+        verbose_name_plural = 'адреса в очереди геокодирования'
+
+    def __str__(self):
+        return self.address
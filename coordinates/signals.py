@@ -0,0 +1,10 @@
+from django.dispatch import Signal
+
+
+# Отправляется после того, как у адресов появились или обновились координаты.
+# Аргументы: addresses — множество адресов
+places_updated = Signal()
+
+# Отправляется воркером геокодирования, чтобы найти адреса, которым нужны координаты.
+# Получатели возвращают адреса, которые должны быть геокодированы
+addresses_requested = Signal()
@@ -1,3 +1,281 @@
-from django.test import TestCase
+import json
+import threading
+import time
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
-# Create your tests here.
+import requests
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from . import geocoder
+from .client import CircuitBreaker, GeocoderClient, GeocoderUnavailable
+from .models import GeocodingTask, Place
+from .signals import addresses_requested
+
+
+FOUND_PLACE = {
+    'response': {
+        'GeoObjectCollection': {
+            'featureMember': [
+                {'GeoObject': {'Point': {'pos': '37.617635 55.755814'}}},
+            ],
+        },
+    },
+}
+
+
+class StandInGeocoderHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.hits += 1
+        status, delay = self.server.responses.pop(0) if self.server.responses else (200, 0)
+        if delay:
+            time.sleep(delay)
+        body = json.dumps(FOUND_PLACE).encode()
+        try:
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # Клиент уже ушёл по таймауту
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StandInGeocoderMixin:
+    """Поднимает локальный HTTP-сервер вместо геокодера.
+
+    Ответы задаются списком `self.server.responses` из пар (статус, задержка),
+    после него сервер отвечает 200 без задержки.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StandInGeocoderHandler)
+        self.server.daemon_threads = True
+        self.server.responses = []
+        self.server.hits = 0
+        self.server_thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.server_thread.start()
+        self.url = f'http://127.0.0.1:{self.server.server_port}/'
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.server_thread.join()
+        super().tearDown()
+
+    def make_client(self, timeout=1, max_retries=2, failure_threshold=3, reset_timeout=60):
+        return GeocoderClient(
+            base_url=self.url,
+            timeout=timeout,
+            max_retries=max_retries,
+            backoff=0,
+            breaker=CircuitBreaker(
+                failure_threshold=failure_threshold,
+                reset_timeout=reset_timeout,
+            ),
+        )
+
+
+class GeocoderClientTest(StandInGeocoderMixin, SimpleTestCase):
+    def test_returns_json(self):
+        client = self.make_client()
+
+        self.assertEqual(client.get_json({'geocode': 'Москва'}), FOUND_PLACE)
+
+        stats = client.get_stats()
+        self.assertEqual(stats['requests'], 1)
+        self.assertEqual(stats['errors'], 0)
+        self.assertEqual(stats['retries'], 0)
+        self.assertEqual(stats['breaker_state'], CircuitBreaker.CLOSED)
+
+    def test_timeout(self):
+        self.server.responses = [(200, 0.5)] * 3
+        client = self.make_client(timeout=0.1, max_retries=2)
+
+        with self.assertRaises(requests.Timeout):
+            client.get_json({})
+
+        stats = client.get_stats()
+        self.assertEqual(stats['requests'], 3)
+        self.assertEqual(stats['errors'], 3)
+        self.assertEqual(stats['retries'], 2)
+        self.assertGreaterEqual(stats['latency_max'], 0.1)
+
+    def test_retries_server_errors(self):
+        self.server.responses = [(503, 0), (500, 0)]
+        client = self.make_client(max_retries=2)
+
+        self.assertEqual(client.get_json({}), FOUND_PLACE)
+
+        stats = client.get_stats()
+        self.assertEqual(self.server.hits, 3)
+        self.assertEqual(stats['requests'], 3)
+        self.assertEqual(stats['errors'], 2)
+        self.assertEqual(stats['retries'], 2)
+
+    def test_retries_too_many_requests(self):
+        self.server.responses = [(429, 0)]
+        client = self.make_client(max_retries=1)
+
+        self.assertEqual(client.get_json({}), FOUND_PLACE)
+        self.assertEqual(client.get_stats()['retries'], 1)
+
+    def test_gives_up_after_retries(self):
+        self.server.responses = [(503, 0)] * 3
+        client = self.make_client(max_retries=2)
+
+        with self.assertRaises(requests.HTTPError):
+            client.get_json({})
+        self.assertEqual(self.server.hits, 3)
+
+    def test_does_not_retry_client_errors(self):
+        self.server.responses = [(403, 0)]
+        client = self.make_client(max_retries=2)
+
+        with self.assertRaises(requests.HTTPError):
+            client.get_json({})
+        self.assertEqual(self.server.hits, 1)
+        self.assertEqual(client.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_breaker_opens_fails_fast_and_closes(self):
+        self.server.responses = [(503, 0)] * 2
+        client = self.make_client(max_retries=0, failure_threshold=2, reset_timeout=0.2)
+
+        for _ in range(2):
+            with self.assertRaises(requests.HTTPError):
+                client.get_json({})
+        self.assertEqual(client.breaker.state, CircuitBreaker.OPEN)
+
+        with self.assertRaises(GeocoderUnavailable):
+            client.get_json({})
+        self.assertEqual(self.server.hits, 2)
+        self.assertEqual(client.get_stats()['rejected'], 1)
+
+        time.sleep(0.25)
+        self.assertTrue(client.breaker.allow_request())
+        self.assertEqual(client.breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertFalse(client.breaker.allow_request())
+        client.breaker.record_success()
+
+        self.assertEqual(client.get_json({}), FOUND_PLACE)
+        self.assertEqual(client.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_failed_probe_reopens_breaker(self):
+        self.server.responses = [(503, 0)] * 2
+        client = self.make_client(max_retries=0, failure_threshold=1, reset_timeout=0.2)
+
+        with self.assertRaises(requests.HTTPError):
+            client.get_json({})
+        time.sleep(0.25)
+        with self.assertRaises(requests.HTTPError):
+            client.get_json({})
+
+        self.assertEqual(client.breaker.state, CircuitBreaker.OPEN)
+        with self.assertRaises(GeocoderUnavailable):
+            client.get_json({})
+        self.assertEqual(self.server.hits, 2)
+
+
+class ProcessGeocodingTasksTest(StandInGeocoderMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.settings_override = override_settings(
+            GEOCODER_URL=self.url,
+            GEOCODER_MAX_RETRIES=0,
+            GEOCODER_RETRY_BACKOFF=0,
+            GEOCODER_BREAKER_THRESHOLD=1,
+            GEOCODER_BREAKER_RESET_TIMEOUT=60,
+            GEOCODER_MAX_WORKERS=1,
+            GEOCODER_MAX_ATTEMPTS=2,
+        )
+        self.settings_override.enable()
+        geocoder._geocoder_client = None
+
+    def tearDown(self):
+        geocoder._geocoder_client = None
+        self.settings_override.disable()
+        super().tearDown()
+
+    def test_resolves_tasks(self):
+        GeocodingTask.objects.create(address='Москва')
+
+        self.assertEqual(geocoder.process_geocoding_tasks(batch_size=10), 1)
+        self.assertFalse(GeocodingTask.objects.exists())
+
+    def test_keeps_tasks_while_breaker_is_open(self):
+        self.server.responses = [(503, 0)]
+        for address in ['Москва', 'Тверь', 'Тула']:
+            GeocodingTask.objects.create(address=address)
+
+        for _ in range(5):
+            self.assertEqual(geocoder.process_geocoding_tasks(batch_size=10), 0)
+
+        self.assertEqual(self.server.hits, 1)
+        self.assertEqual(
+            sorted(GeocodingTask.objects.values_list('attempts', flat=True)),
+            [0, 0, 1],
+        )
+
+    def test_skips_claimed_tasks_until_claim_expires(self):
+        GeocodingTask.objects.create(
+            address='Москва',
+            claimed_until=timezone.now() + timedelta(minutes=1),
+        )
+        GeocodingTask.objects.create(
+            address='Тверь',
+            claimed_until=timezone.now() - timedelta(minutes=1),
+        )
+
+        self.assertEqual(geocoder.process_geocoding_tasks(batch_size=10), 1)
+        self.assertEqual(self.server.hits, 1)
+        self.assertEqual(
+            list(GeocodingTask.objects.values_list('address', flat=True)),
+            ['Москва'],
+        )
+
+    def test_releases_claim_of_failed_tasks(self):
+        self.server.responses = [(503, 0)]
+        GeocodingTask.objects.create(address='Москва')
+
+        self.assertEqual(geocoder.process_geocoding_tasks(batch_size=10), 0)
+
+        task = GeocodingTask.objects.get()
+        self.assertEqual(task.attempts, 1)
+        self.assertIsNone(task.claimed_until)
+
+    def test_postpones_tasks_instead_of_dropping_them(self):
+        self.server.responses = [(503, 0)]
+        GeocodingTask.objects.create(address='Москва', attempts=1)
+
+        self.assertEqual(geocoder.process_geocoding_tasks(batch_size=10), 0)
+
+        task = GeocodingTask.objects.get()
+        self.assertEqual(task.attempts, 0)
+        self.assertGreater(task.claimed_until, timezone.now())
+        self.assertEqual(geocoder.process_geocoding_tasks(batch_size=10), 0)
+        self.assertEqual(self.server.hits, 1)
+
+    def test_requeues_stale_addresses(self):
+        def request_addresses(sender, **kwargs):
+            return ['Москва', 'Тверь', 'Тула']
+
+        addresses_requested.connect(request_addresses)
+        self.addCleanup(addresses_requested.disconnect, request_addresses)
+        Place.objects.create(address='Москва', lat=55.755814, lon=37.617635)
+        Place.objects.create(
+            address='Тверь',
+            expires_at=timezone.now() - timedelta(minutes=1),
+        )
+
+        geocoder.requeue_stale_addresses()
+
+        self.assertEqual(
+            set(GeocodingTask.objects.values_list('address', flat=True)),
+            {'Тверь', 'Тула'},
+        )
@@ -11,6 +11,11 @@ source venv/bin/activate
 pip3 install -r requirements.txt
 python3 manage.py collectstatic --no-input
 python3 manage.py migrate --no-input
+python3 manage.py createcachetable
+python3 manage.py refresh_order_distances
+python3 manage.py generate_thumbnails
+python3 manage.py build_api_snapshots
 systemctl restart star-burger.service
+systemctl restart star-burger-geocoder.service
 http https://api.rollbar.com/api/1/deploy X-Rollbar-Access-Token:$ROLLBAR_TOKEN environment=$ROLLBAR_ENVIRONMENT revision=$(git rev-parse HEAD)
 echo "Sucessfully deployed!"
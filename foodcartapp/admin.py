@@ -1,5 +1,3 @@
-from collections import defaultdict
-
 from django.contrib import admin
 from django.shortcuts import reverse, redirect
 from django.templatetags.static import static
@@ -7,28 +5,42 @@ from django.utils.html import format_html
 from django.utils.http import url_has_allowed_host_and_scheme
 from django.conf import settings
 from django import forms
+from django.db.models import Case, When
+
+from coordinates.geocoder import get_known_coordinates
 
+from .admin_search import RESTAURANTS_VERSION, CachedAutocompleteSearchMixin
+from .availability import get_availability_index
+from .catalog import CATALOG_VERSION
+from .commit_hooks import collect_on_commit
 from .models import Product
 from .models import ProductCategory
 from .models import Restaurant
 from .models import RestaurantMenuItem
 from .models import Order
 from .models import OrderItem
+from .models import update_order_totals
+from .order_distances import refresh_order_distances
+from .restaurant_index import get_restaurant_index
+from .thumbnails import PRODUCT_IMAGE_WIDTHS, get_smallest_thumbnail_url
 
 
 class RestaurantMenuItemInline(admin.TabularInline):
     model = RestaurantMenuItem
+    autocomplete_fields = ['restaurant', 'product']
     extra = 0
 
 
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
     readonly_fields = ('price',)
+    autocomplete_fields = ['product']
     extra = 0
 
 
 @admin.register(Restaurant)
-class RestaurantAdmin(admin.ModelAdmin):
+class RestaurantAdmin(CachedAutocompleteSearchMixin, admin.ModelAdmin):
+    search_cache_version = RESTAURANTS_VERSION
     search_fields = [
         'name',
         'address',
@@ -45,7 +57,8 @@ class RestaurantAdmin(admin.ModelAdmin):
 
 
 @admin.register(Product)
-class ProductAdmin(admin.ModelAdmin):
+class ProductAdmin(CachedAutocompleteSearchMixin, admin.ModelAdmin):
+    search_cache_version = CATALOG_VERSION
     list_display = [
         'get_image_list_preview',
         'name',
@@ -110,7 +123,8 @@ class ProductAdmin(admin.ModelAdmin):
         if not obj.image or not obj.id:
             return 'нет картинки'
         edit_url = reverse('admin:foodcartapp_product_change', args=(obj.id,))
-        return format_html('<a href="{edit_url}"><img src="{src}" style="max-height: 50px;"/></a>', edit_url=edit_url, src=obj.image.url)
+        src = get_smallest_thumbnail_url(obj.image, PRODUCT_IMAGE_WIDTHS)
+        return format_html('<a href="{edit_url}"><img src="{src}" style="max-height: 50px;"/></a>', edit_url=edit_url, src=src)
     get_image_list_preview.short_description = 'превью'
 
 
@@ -122,22 +136,60 @@ class ProductAdmin(admin.ModelAdmin):
 class OrderAdminForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         super(OrderAdminForm, self).__init__(*args, **kwargs)
-        product_ids = (order_item.product_id for order_item in self.instance.items.all())
-        restaurants_for_products = defaultdict(set)
-        restaurant_menu_items = (RestaurantMenuItem.objects
-                                 .filter(availability=True))
-        for menu_item in restaurant_menu_items:
-            restaurants_for_products[menu_item.product_id].add(menu_item.restaurant_id)
-        available_restaurants = restaurants_for_products[next(product_ids)]
-        for product_id in product_ids:
-            available_restaurants &= restaurants_for_products[product_id]
-        self.fields['restaurant'].queryset = \
-            self.fields['restaurant'].queryset.filter(id__in=available_restaurants)
+        product_ids = set()
+        if self.instance.pk:
+            product_ids = set(self.instance.items.values_list('product_id', flat=True))
+        restaurants = self.fields['restaurant'].queryset
+        available_restaurants = None
+        if product_ids:
+            available_restaurants = {
+                *get_availability_index().get_restaurant_ids(product_ids),
+                # Уже назначенный ресторан оставляем, даже если меню поменялось
+                *([self.instance.restaurant_id] if self.instance.restaurant_id else []),
+            }
+            restaurants = restaurants.filter(id__in=available_restaurants)
+        order_coordinates = get_known_coordinates([self.instance.address]).get(self.instance.address)
+        nearest_restaurants = get_restaurant_index().nearest(
+            order_coordinates,
+            available_restaurants,
+        )
+        distance_ordering = Case(
+            *[
+                When(id=restaurant_id, then=position)
+                for position, (restaurant_id, _) in enumerate(nearest_restaurants)
+            ],
+            default=len(nearest_restaurants),
+        )
+        self.fields['restaurant'].queryset = restaurants.order_by(distance_ordering, 'name')
+
+
+@admin.action(description='Назначить ближайший ресторан, который может приготовить заказ')
+def assign_nearest_restaurants(modeladmin, request, queryset):
+    assigned_count = queryset.assign_nearest_restaurants()
+    modeladmin.message_user(request, f'Назначен ближайший ресторан заказам: {assigned_count}')
+
+
+def make_set_field_action(field_name, value, title):
+    @admin.action(description=title)
+    def set_field(modeladmin, request, queryset):
+        updated_count = queryset.update(**{field_name: value})
+        modeladmin.message_user(request, f'Обновлено заказов: {updated_count}')
+    set_field.__name__ = f'set_{field_name}_{value.lower()}'
+    return set_field
 
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
     list_select_related = True
+    list_display = [
+        '__str__',
+        'status',
+        'total',
+        'registered_at',
+    ]
+    readonly_fields = [
+        'total',
+    ]
     search_fields = [
         'phonenumber',
     ]
@@ -145,6 +197,17 @@ class OrderAdmin(admin.ModelAdmin):
         OrderItemInline
     ]
     form = OrderAdminForm
+    actions = [
+        assign_nearest_restaurants,
+        *[
+            make_set_field_action('status', status, f'Статус: {title.lower()}')
+            for status, title in Order.ORDER_STATUS_CHOICES
+        ],
+        *[
+            make_set_field_action('payment_method', payment_method, f'Способ платежа: {title.lower()}')
+            for payment_method, title in Order.ORDER_PAYMENT_CHOICES
+        ],
+    ]
 
     def response_post_save_change(self, request, obj):
         standard_response = super().response_post_save_change(request, obj)
@@ -159,14 +222,43 @@ class OrderAdmin(admin.ModelAdmin):
             return standard_response
 
     def save_formset(self, request, form, formset, change):
-        instances = formset.save(commit=False)
-        for instance in instances:
-            if not instance.price:
-                instance.price = instance.product.price
-            instance.save()
-        formset.save()
+        order_items = formset.save(commit=False)
+        product_prices = dict(
+            Product.objects
+            .filter(id__in={
+                order_item.product_id
+                for order_item in order_items
+                if not order_item.price
+            })
+            .values_list('id', 'price')
+        )
+        for order_item in order_items:
+            if not order_item.price:
+                order_item.price = product_prices[order_item.product_id]
+
+        OrderItem.objects.bulk_create(formset.new_objects)
+        changed_order_items = [order_item for order_item, _ in formset.changed_objects]
+        if changed_order_items:
+            OrderItem.objects.bulk_update(
+                changed_order_items,
+                ['product', 'quantity', 'price'],
+            )
+        if formset.deleted_objects:
+            OrderItem.objects.filter(
+                id__in=[order_item.id for order_item in formset.deleted_objects]
+            ).delete()
+        # Удаление шлёт post_delete на каждую позицию, а массовые вставка
+        # и обновление сигналов не шлют: все они сводятся к одному пересчёту
+        collect_on_commit(update_order_totals, {form.instance.pk})
 
     def save_model(self, request, obj, form, change):
         if obj.status == Order.UNPROCESSED and obj.restaurant:
             obj.status = Order.IN_PROCESS
         super().save_model(request, obj, form, change)
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        address_changed = 'address' in form.changed_data
+        items_changed = any(formset.has_changed() for formset in formsets)
+        if address_changed or items_changed:
+            refresh_order_distances(Order.objects.filter(pk=form.instance.pk))
@@ -0,0 +1,50 @@
+import hashlib
+
+from django.core.cache import cache
+
+from .cache_versions import get_version
+
+
+RESTAURANTS_VERSION = 'restaurants'
+SEARCH_CACHE_TIMEOUT = 60 * 60
+SEARCH_MAX_RESULTS = 1000
+
+
+class CachedAutocompleteSearchMixin:
+    """Кэширует id найденных объектов для виджетов автодополнения в админке.
+
+    Кэш привязан к версии `search_cache_version` и сбрасывается вместе с ней.
+    """
+
+    search_cache_version = None
+    autocomplete_ordering = ['name', 'id']
+
+    def get_search_results(self, request, queryset, search_term):
+        is_autocomplete = (
+            request.resolver_match is not None
+            and request.resolver_match.url_name == 'autocomplete'
+        )
+        if not is_autocomplete:
+            return super().get_search_results(request, queryset, search_term)
+
+        queryset = queryset.order_by(*self.autocomplete_ordering)
+        if not search_term:
+            return queryset, False
+
+        term_hash = hashlib.md5(search_term.encode()).hexdigest()
+        cache_key = (
+            f'foodcartapp:admin_search:{self.model._meta.model_name}:'
+            f'{get_version(self.search_cache_version)}:{term_hash}'
+        )
+        found_ids = cache.get(cache_key)
+        if found_ids is None:
+            found, may_have_duplicates = super().get_search_results(
+                request,
+                queryset,
+                search_term,
+            )
+            if may_have_duplicates:
+                found = found.distinct()
+            found_ids = list(found.values_list('id', flat=True)[:SEARCH_MAX_RESULTS])
+            cache.set(cache_key, found_ids, timeout=SEARCH_CACHE_TIMEOUT)
+        return queryset.filter(id__in=found_ids), False
@@ -0,0 +1,125 @@
+import threading
+
+import numpy as np
+from django.core.cache import cache
+
+from .cache_versions import get_version
+
+
+MENU_VERSION = 'menu'
+INDEX_CACHE_TIMEOUT = 24 * 60 * 60
+
+
+class AvailabilityIndex:
+    def __init__(self, restaurant_ids, masks):
+        self.restaurant_ids = tuple(restaurant_ids)
+        self.masks = masks
+
+    @classmethod
+    def build(cls):
+        from .models import RestaurantMenuItem
+
+        menu_items = list(
+            RestaurantMenuItem.objects
+            .filter(availability=True)
+            .values_list('product_id', 'restaurant_id')
+        )
+        restaurant_ids = sorted({restaurant_id for _, restaurant_id in menu_items})
+        restaurant_bits = {
+            restaurant_id: 1 << position
+            for position, restaurant_id in enumerate(restaurant_ids)
+        }
+        masks = {}
+        for product_id, restaurant_id in menu_items:
+            masks[product_id] = masks.get(product_id, 0) | restaurant_bits[restaurant_id]
+        return cls(restaurant_ids, masks)
+
+    def get_mask(self, product_ids):
+        product_ids = iter(product_ids)
+        first_product_id = next(product_ids, None)
+        if first_product_id is None:
+            return 0
+        mask = self.masks.get(first_product_id, 0)
+        for product_id in product_ids:
+            mask &= self.masks.get(product_id, 0)
+        return mask
+
+    def get_restaurant_ids(self, product_ids):
+        mask = self.get_mask(product_ids)
+        restaurant_ids = []
+        while mask:
+            lowest_bit = mask & -mask
+            restaurant_ids.append(self.restaurant_ids[lowest_bit.bit_length() - 1])
+            mask ^= lowest_bit
+        return restaurant_ids
+
+
+class AvailabilityMatrix:
+    def __init__(self, product_ids, restaurant_ids, matrix):
+        self.product_ids = product_ids
+        self.restaurant_ids = restaurant_ids
+        self.matrix = matrix
+
+    @classmethod
+    def build(cls):
+        from .models import RestaurantMenuItem
+
+        menu_items = np.array(
+            RestaurantMenuItem.objects
+            .filter(availability=True)
+            .values_list('product_id', 'restaurant_id'),
+            dtype=np.int64,
+        ).reshape(-1, 2)
+        product_ids, rows = np.unique(menu_items[:, 0], return_inverse=True)
+        restaurant_ids, columns = np.unique(menu_items[:, 1], return_inverse=True)
+        matrix = np.zeros((len(product_ids), len(restaurant_ids)), dtype=bool)
+        matrix[rows, columns] = True
+        return cls(product_ids, restaurant_ids, matrix)
+
+    @staticmethod
+    def _get_positions(known_ids, ids):
+        ids = np.asarray(ids, dtype=np.int64)
+        if not len(known_ids):
+            return np.zeros(len(ids), dtype=np.intp), np.zeros(len(ids), dtype=bool)
+        positions = np.minimum(np.searchsorted(known_ids, ids), len(known_ids) - 1)
+        return positions, known_ids[positions] == ids
+
+    def get_submatrix(self, product_ids, restaurant_ids):
+        rows, known_rows = self._get_positions(self.product_ids, product_ids)
+        columns, known_columns = self._get_positions(self.restaurant_ids, restaurant_ids)
+        submatrix = np.zeros((len(rows), len(columns)), dtype=bool)
+        if known_rows.any() and known_columns.any():
+            submatrix[np.ix_(known_rows, known_columns)] = self.matrix[
+                np.ix_(rows[known_rows], columns[known_columns])
+            ]
+        return submatrix
+
+
+def get_availability_matrix():
+    cache_key = f'foodcartapp:availability_matrix:{get_version(MENU_VERSION)}'
+    matrix = cache.get(cache_key)
+    if matrix is None:
+        matrix = AvailabilityMatrix.build()
+        cache.set(cache_key, matrix, timeout=INDEX_CACHE_TIMEOUT)
+    return matrix
+
+
+_index = None
+_index_version = None
+_index_lock = threading.Lock()
+
+
+def get_availability_index():
+    global _index, _index_version
+    version = get_version(MENU_VERSION)
+    with _index_lock:
+        if _index_version == version:
+            return _index
+    cache_key = f'foodcartapp:availability_index:{version}'
+    index = cache.get(cache_key)
+    if index is None:
+        index = AvailabilityIndex.build()
+        cache.set(cache_key, index, timeout=INDEX_CACHE_TIMEOUT)
+    with _index_lock:
+        _index, _index_version = index, version
+    return index
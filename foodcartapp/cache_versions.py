@@ -0,0 +1,38 @@
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+
+def _get_version_key(name):
+    return f'foodcartapp:{name}:version'
+
+
+def _get_initial_version():
+    # Начинаем не с единицы, чтобы после вытеснения ключа из кэша
+    # версия не совпала ни с одной из уже выданных
+    return time.time_ns() // 1000
+
+
+def get_version(name):
+    key = _get_version_key(name)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _get_initial_version(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(name):
+    key = _get_version_key(name)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        version = _get_initial_version()
+        cache.set(key, version, timeout=None)
+        return version
+
+
+def bump_version_on_commit(name):
+    # Кэш, собранный до коммита, мог захватить старые данные под новой версией
+    transaction.on_commit(lambda: bump_version(name))
@@ -0,0 +1,56 @@
+import json
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .cache_versions import get_version
+from .models import Product
+from .thumbnails import PRODUCT_IMAGE_WIDTHS, get_srcsets
+
+
+CATALOG_VERSION = 'catalog'
+CATALOG_CACHE_TIMEOUT = 24 * 60 * 60
+
+
+def serialize_catalog():
+    products = Product.objects.select_related('category').available()
+
+    dumped_products = []
+    for product in products:
+        dumped_product = {
+            'id': product.id,
+            'name': product.name,
+            'price': product.price,
+            'special_status': product.special_status,
+            'description': product.description,
+            'category': {
+                'id': product.category.id,
+                'name': product.category.name,
+            } if product.category else None,
+            'image': product.image.url,
+            'image_srcset': get_srcsets(product.image, PRODUCT_IMAGE_WIDTHS),
+            'restaurant': {
+                'id': product.id,
+                'name': product.name,
+            }
+        }
+        dumped_products.append(dumped_product)
+    return dumped_products
+
+
+def get_catalog_etag():
+    return f'"catalog-{get_version(CATALOG_VERSION)}"'
+
+
+def get_catalog_json():
+    etag = get_catalog_etag()
+    cache_key = f'foodcartapp:catalog:{etag}'
+    catalog_json = cache.get(cache_key)
+    if catalog_json is None:
+        catalog_json = json.dumps(
+            serialize_catalog(),
+            cls=DjangoJSONEncoder,
+            ensure_ascii=False,
+        ).encode()
+        cache.set(cache_key, catalog_json, timeout=CATALOG_CACHE_TIMEOUT)
+    return etag, catalog_json
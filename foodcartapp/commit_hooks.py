@@ -0,0 +1,53 @@
+import threading
+import weakref
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+
+_local = threading.local()
+
+
+class _PendingCallback:
+    def __init__(self, key, callback, items):
+        self.key = key
+        self.callback = callback
+        self.items = items
+
+    def __call__(self):
+        _get_pending_callbacks().pop(self.key, None)
+        if self.items is None:
+            self.callback()
+        else:
+            self.callback(self.items)
+
+
+def _get_pending_callbacks():
+    if not hasattr(_local, 'pending_callbacks'):
+        _local.pending_callbacks = {}
+    return _local.pending_callbacks
+
+
+def _add_pending_callback(callback, items, using):
+    key = (using or DEFAULT_DB_ALIAS, callback)
+    pending_callbacks = _get_pending_callbacks()
+    # Ссылка слабая: при откате Django выбрасывает ожидающий callback,
+    # ссылка обнуляется, и следующая транзакция зарегистрирует его заново
+    pending_callback_ref = pending_callbacks.get(key)
+    pending_callback = pending_callback_ref() if pending_callback_ref else None
+    if pending_callback is not None:
+        if items is not None:
+            pending_callback.items.update(items)
+        return
+    pending_callback = _PendingCallback(key, callback, items)
+    pending_callbacks[key] = weakref.ref(pending_callback)
+    transaction.on_commit(pending_callback, using=using)
+
+
+def on_commit_once(callback, using=None):
+    """Вызывает callback после коммита один раз, сколько бы раз его ни зарегистрировали."""
+    _add_pending_callback(callback, None, using)
+
+
+def collect_on_commit(callback, items, using=None):
+    """Копит items за транзакцию и после коммита один раз вызывает callback(items)."""
+    _add_pending_callback(callback, set(items), using)
@@ -0,0 +1,55 @@
+import timeit
+
+from django.core.management.base import BaseCommand
+
+from foodcartapp.models import Order
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает подбор ресторанов для заказов в Python и в базе данных'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--orders',
+            type=int,
+            default=100,
+            help='Сколько незавершённых заказов проверять',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='Сколько раз повторить замер',
+        )
+
+    def handle(self, *args, **options):
+        orders = (
+            Order.objects
+            .exclude(status=Order.COMPLETED)
+            .order_by('id')[:options['orders']]
+        )
+
+        def find_in_python():
+            return {
+                order.id: {restaurant.id for restaurant in order.available_restaurants}
+                for order in orders.prefetch_related('items').with_available_restaurants()
+            }
+
+        def find_in_database():
+            return orders.get_available_restaurant_ids()
+
+        python_result = find_in_python()
+        database_result = find_in_database()
+        mismatched_orders = [
+            order_id for order_id, restaurant_ids in python_result.items()
+            if database_result[order_id] != restaurant_ids
+        ]
+        if mismatched_orders:
+            self.stderr.write(f'Результаты расходятся для заказов: {mismatched_orders}')
+
+        for title, find_restaurants in [
+            ('Python', find_in_python),
+            ('База данных', find_in_database),
+        ]:
+            best_time = min(timeit.repeat(find_restaurants, number=1, repeat=options['repeat']))
+            self.stdout.write(f'{title}: {best_time * 1000:.2f} мс на {len(python_result)} заказов')
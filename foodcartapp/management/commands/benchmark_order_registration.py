@@ -0,0 +1,84 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import RequestFactory
+
+from foodcartapp.models import Product
+from foodcartapp.views import (
+    register_order,
+    register_order_with_serializer,
+    register_orders_batch,
+)
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает скорость регистрации заказов через OrderSerializer, быстрым путём и пачкой'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--orders',
+            type=int,
+            default=200,
+            help='Сколько заказов регистрировать',
+        )
+        parser.add_argument(
+            '--items',
+            type=int,
+            default=5,
+            help='Сколько позиций в каждом заказе',
+        )
+
+    def handle(self, *args, **options):
+        product_ids = list(
+            Product.objects.available().values_list('id', flat=True)[:options['items']]
+        )
+        if not product_ids:
+            raise CommandError('Нет товаров в продаже')
+        orders_details = [
+            {
+                'firstname': 'Иван',
+                'lastname': 'Петров',
+                'address': 'Москва, Красная площадь, 1',
+                'phonenumber': f'+7929{number % 10000000:07d}',
+                'products': [
+                    {'product': product_id, 'quantity': 1}
+                    for product_id in product_ids
+                ],
+            }
+            for number in range(options['orders'])
+        ]
+        factory = RequestFactory()
+
+        def post(view, path, data):
+            request = factory.post(path, json.dumps(data), content_type='application/json')
+            response = view(request)
+            if response.status_code != 200:
+                raise CommandError(f'{path}: {response.status_code} {response.content}')
+
+        def register_with_serializer():
+            for order_details in orders_details:
+                post(register_order_with_serializer, '/api/order/', order_details)
+
+        def register_one_by_one():
+            for order_details in orders_details:
+                post(register_order, '/api/order/', order_details)
+
+        def register_batch():
+            post(register_orders_batch, '/api/order/batch/', orders_details)
+
+        for title, register in [
+            ('По одному через OrderSerializer', register_with_serializer),
+            ('По одному быстрым путём', register_one_by_one),
+            ('Пачкой', register_batch),
+        ]:
+            with transaction.atomic():
+                started_at = time.perf_counter()
+                register()
+                elapsed = time.perf_counter() - started_at
+                transaction.set_rollback(True)
+            self.stdout.write(
+                f'{title}: {elapsed * 1000:.0f} мс, '
+                f'{len(orders_details) / elapsed:.0f} заказов/с'
+            )
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from foodcartapp.snapshots import write_banner_snapshots, write_products_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Собирает сжатые файлы с ответами API каталога и баннеров'
+
+    def handle(self, *args, **options):
+        write_products_snapshot()
+        write_banner_snapshots()
+        self.stdout.write('Файлы с ответами API собраны')
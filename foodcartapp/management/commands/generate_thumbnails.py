@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+
+from banners.models import Banner
+from banners.payloads import BANNER_IMAGE_WIDTHS, BANNERS_VERSION
+
+from foodcartapp.cache_versions import bump_version
+from foodcartapp.catalog import CATALOG_VERSION
+from foodcartapp.models import Product
+from foodcartapp.snapshots import write_banner_snapshots, write_products_snapshot
+from foodcartapp.thumbnails import PRODUCT_IMAGE_WIDTHS, generate_thumbnails
+
+
+class Command(BaseCommand):
+    help = 'Нарезает уменьшенные копии картинок товаров и баннеров'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--overwrite',
+            action='store_true',
+            help='Пересоздать уже существующие копии',
+        )
+
+    def handle(self, *args, **options):
+        products = Product.objects.exclude(image='')
+        for product in products.iterator():
+            generate_thumbnails(
+                product.image,
+                PRODUCT_IMAGE_WIDTHS,
+                overwrite=options['overwrite'],
+            )
+        banners = Banner.objects.exclude(image='')
+        for banner in banners.iterator():
+            generate_thumbnails(
+                banner.image,
+                BANNER_IMAGE_WIDTHS,
+                overwrite=options['overwrite'],
+            )
+        bump_version(CATALOG_VERSION)
+        bump_version(BANNERS_VERSION)
+        # Готовые ответы API тоже ссылаются на копии картинок
+        write_products_snapshot()
+        write_banner_snapshots()
+        self.stdout.write(
+            f'Обработано товаров: {products.count()}, баннеров: {banners.count()}'
+        )
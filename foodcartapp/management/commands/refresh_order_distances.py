@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from coordinates.geocoder import enqueue_addresses
+from foodcartapp.models import Order, Restaurant
+from foodcartapp.order_distances import refresh_order_distances
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает расстояния от ресторанов до незавершённых заказов'
+
+    def handle(self, *args, **options):
+        open_orders = Order.objects.exclude(status=Order.COMPLETED)
+        enqueue_addresses(
+            set(open_orders.values_list('address', flat=True))
+            | set(Restaurant.objects.values_list('address', flat=True))
+        )
+        refresh_order_distances(open_orders)
+        self.stdout.write('Расстояния пересчитаны. Адреса без координат поставлены в очередь геокодирования')
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from foodcartapp.models import Order
+
+
+class Command(BaseCommand):
+    help = 'Находит заказы, у которых сумма разошлась с позициями, и пересчитывает её'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать заказы с неверной суммой',
+        )
+
+    def handle(self, *args, **options):
+        drifted_order_ids = list(
+            Order.objects
+            .with_items_total()
+            .exclude(total=F('items_total'))
+            .values_list('id', flat=True)
+        )
+        if not drifted_order_ids:
+            self.stdout.write('Суммы всех заказов верны')
+            return
+        self.stdout.write(f'Заказы с неверной суммой: {drifted_order_ids}')
+        if options['dry_run']:
+            return
+        Order.objects.filter(id__in=drifted_order_ids).update_totals()
+        self.stdout.write(f'Пересчитано заказов: {len(drifted_order_ids)}')
@@ -0,0 +1,28 @@
+# Generated by Django 4.0.5 on 2026-10-18 18:55
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0052_auto_20220603_0330'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderDistance',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('distance', models.FloatField(verbose_name='расстояние, км')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='restaurant_distances', to='foodcartapp.order', verbose_name='заказ')),
+                ('restaurant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='order_distances', to='foodcartapp.restaurant', verbose_name='ресторан')),
+            ],
+            options={
+                'verbose_name': 'расстояние от ресторана до заказа',
+                'verbose_name_plural': 'расстояния от ресторанов до заказов',
+                'unique_together': {('order', 'restaurant')},
+            },
+        ),
+    ]
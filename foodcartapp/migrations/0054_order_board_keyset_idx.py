@@ -0,0 +1,17 @@
+# Generated by Django 4.0.5 on 2026-10-18 18:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0053_orderdistance'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['-status', 'registered_at', 'id'], name='order_board_keyset_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.0.5 on 2026-10-18 18:57
+
+from django.db import migrations, models
+
+
+def create_order_change_counter(apps, schema_editor):
+    OrderChangeCounter = apps.get_model('foodcartapp', 'OrderChangeCounter')
+    OrderChangeCounter.objects.get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0054_order_board_keyset_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderChangeCounter',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_change_seq', models.BigIntegerField(default=0, verbose_name='последний номер изменения')),
+            ],
+            options={
+                'verbose_name': 'счётчик изменений заказов',
+                'verbose_name_plural': 'счётчики изменений заказов',
+            },
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='change_seq',
+            field=models.BigIntegerField(db_index=True, default=0, editable=False, verbose_name='номер изменения'),
+        ),
+        migrations.RunPython(create_order_change_counter, migrations.RunPython.noop),
+    ]
@@ -1,11 +1,15 @@
 from collections import defaultdict
+from decimal import Decimal
 
-from django.db import models
-from django.db.models import F, Sum
+from django.db import models, transaction
+from django.db.models import Case, Count, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from django.core.validators import MinValueValidator
 from phonenumber_field.modelfields import PhoneNumberField
 
+from .availability import get_availability_index
+
 
 class Restaurant(models.Model):
     name = models.CharField(
@@ -128,27 +132,168 @@ class RestaurantMenuItem(models.Model):
         return f"{self.restaurant.name} - {self.product.name}"
 
 
+class OrderChangeCounter(models.Model):
+    last_change_seq = models.BigIntegerField(
+        'последний номер изменения',
+        default=0,
+    )
+
+    class Meta:
+        verbose_name = 'счётчик изменений заказов'
+        verbose_name_plural = 'счётчики изменений заказов'
+
+    @classmethod
+    def allocate(cls, count=1):
+        with transaction.atomic():
+            updated = cls.objects.filter(pk=1).update(
+                last_change_seq=F('last_change_seq') + count
+            )
+            if not updated:
+                cls.objects.get_or_create(pk=1)
+                cls.objects.filter(pk=1).update(
+                    last_change_seq=F('last_change_seq') + count
+                )
+            last_change_seq = cls.objects.values_list(
+                'last_change_seq', flat=True
+            ).get(pk=1)
+        return range(last_change_seq - count + 1, last_change_seq + 1)
+
+    @classmethod
+    def get_last_change_seq(cls):
+        last_change_seq = (
+            cls.objects
+            .filter(pk=1)
+            .values_list('last_change_seq', flat=True)
+            .first()
+        )
+        return last_change_seq or 0
+
+
 class OrderQuerySet(models.QuerySet):
-    def with_order_sum(self):
-        return self.prefetch_related('items').annotate(
-            order_sum=Sum(F('items__quantity') * F('items__price'))
+    def update(self, **kwargs):
+        self.mark_changed()
+        return super().update(**kwargs)
+
+    def mark_changed(self):
+        # Номер изменения выдаётся после коммита в короткой транзакции:
+        # строка счётчика блокируется только на время этой транзакции,
+        # а номера всё равно становятся видны в порядке возрастания
+        order_ids = list(self.values_list('id', flat=True))
+        if order_ids:
+            transaction.on_commit(
+                lambda: Order.objects.filter(id__in=order_ids).assign_change_seq(),
+                using=self.db,
+            )
+
+    def assign_change_seq(self):
+        with transaction.atomic(using=self.db):
+            change_seq = OrderChangeCounter.allocate()[0]
+            return super().update(change_seq=change_seq)
+
+    def with_items_total(self):
+        return self.annotate(
+            items_total=Coalesce(
+                Sum(F('items__quantity') * F('items__price')),
+                Value(Decimal(0)),
+                output_field=models.DecimalField(),
+            )
         )
 
+    def update_totals(self):
+        items_total = (
+            OrderItem.objects
+            .filter(order=OuterRef('pk'))
+            .values('order')
+            .annotate(total=Sum(F('quantity') * F('price')))
+            .values('total')
+        )
+        return self.update(total=Coalesce(
+            Subquery(items_total),
+            Value(Decimal(0)),
+            output_field=models.DecimalField(),
+        ))
+
     def with_available_restaurants(self):
-        restaurant_menu_items = (RestaurantMenuItem.objects
-                                 .filter(availability=True)
-                                 .select_related('restaurant'))
-        restaurants_for_products = defaultdict(set)
-        for menu_item in restaurant_menu_items:
-            restaurants_for_products[menu_item.product_id].add(menu_item.restaurant)
+        availability_index = get_availability_index()
+        restaurant_ids_for_order = {
+            order.id: availability_index.get_restaurant_ids(
+                {order_item.product_id for order_item in order.items.all()}
+            )
+            for order in self
+        }
+        restaurants = Restaurant.objects.in_bulk({
+            restaurant_id
+            for restaurant_ids in restaurant_ids_for_order.values()
+            for restaurant_id in restaurant_ids
+        })
         for order in self:
-            product_ids = (order_item.product_id for order_item in order.items.all())
-            available_restaurants = restaurants_for_products[next(product_ids)]
-            for product_id in product_ids:
-                available_restaurants &= restaurants_for_products[product_id]
-            order.available_restaurants = list(available_restaurants)
+            order.available_restaurants = [
+                restaurants[restaurant_id]
+                for restaurant_id in restaurant_ids_for_order[order.id]
+                if restaurant_id in restaurants
+            ]
         return self
 
+    def get_available_restaurant_ids(self):
+        order_products_count = (
+            OrderItem.objects
+            .filter(order=OuterRef('order_id'))
+            .values('order')
+            .annotate(products_count=Count('product', distinct=True))
+            .values('products_count')
+        )
+        order_restaurants = (
+            OrderItem.objects
+            .filter(
+                order__in=self.values('id'),
+                product__menu_items__availability=True,
+            )
+            .values('order_id', 'product__menu_items__restaurant_id')
+            .annotate(
+                available_products_count=Count('product', distinct=True),
+                order_products_count=Subquery(order_products_count),
+            )
+            .filter(available_products_count=F('order_products_count'))
+            .values_list('order_id', 'product__menu_items__restaurant_id')
+        )
+        restaurant_ids_for_order = defaultdict(set)
+        for order_id, restaurant_id in order_restaurants:
+            restaurant_ids_for_order[order_id].add(restaurant_id)
+        return restaurant_ids_for_order
+
+    def assign_nearest_restaurants(self):
+        orders = self.exclude(status=Order.COMPLETED).filter(restaurant__isnull=True)
+        restaurant_ids_for_order = orders.get_available_restaurant_ids()
+        order_distances = (
+            OrderDistance.objects
+            .filter(order__in=orders.values('id'))
+            .order_by('order_id', 'distance')
+            .values_list('order_id', 'restaurant_id')
+        )
+        order_ids_for_restaurant = defaultdict(list)
+        assigned_order_ids = set()
+        for order_id, restaurant_id in order_distances:
+            if order_id in assigned_order_ids:
+                continue
+            if restaurant_id in restaurant_ids_for_order[order_id]:
+                order_ids_for_restaurant[restaurant_id].append(order_id)
+                assigned_order_ids.add(order_id)
+
+        with transaction.atomic():
+            for restaurant_id, order_ids in order_ids_for_restaurant.items():
+                Order.objects.filter(id__in=order_ids, restaurant__isnull=True).update(
+                    restaurant_id=restaurant_id,
+                    status=Case(
+                        When(status=Order.UNPROCESSED, then=Value(Order.IN_PROCESS)),
+                        default=F('status'),
+                    ),
+                )
+        return len(assigned_order_ids)
+
+
+def update_order_totals(order_ids):
+    Order.objects.filter(id__in=order_ids).update_totals()
+
 
 class Order(models.Model):
     UNPROCESSED = 'UNPRCSSED'
@@ -230,16 +375,39 @@ class Order(models.Model):
         blank=True,
         null=True,
     )
+    total = models.DecimalField(
+        'сумма заказа',
+        max_digits=10,
+        decimal_places=2,
+        default=0,
+        editable=False,
+    )
+    change_seq = models.BigIntegerField(
+        'номер изменения',
+        default=0,
+        db_index=True,
+        editable=False,
+    )
 
     objects = OrderQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'заказ'
         verbose_name_plural = 'заказы'
+        indexes = [
+            models.Index(
+                fields=['-status', 'registered_at', 'id'],
+                name='order_board_keyset_idx',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.firstname} {self.lastname} {self.phonenumber}"
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        Order.objects.filter(pk=self.pk).mark_changed()
+
 
 class OrderItem(models.Model):
     order = models.ForeignKey(
@@ -268,3 +436,31 @@ class OrderItem(models.Model):
     class Meta:
         verbose_name = 'позиция заказа'
         verbose_name_plural = 'позиции в заказе'
+
+
+class OrderDistance(models.Model):
+    order = models.ForeignKey(
+        Order,
+        related_name='restaurant_distances',
+        verbose_name='заказ',
+        on_delete=models.CASCADE,
+    )
+    restaurant = models.ForeignKey(
+        Restaurant,
+        related_name='order_distances',
+        verbose_name='ресторан',
+        on_delete=models.CASCADE,
+    )
+    distance = models.FloatField(
+        'расстояние, км',
+    )
+
+    class Meta:
+        verbose_name = 'расстояние от ресторана до заказа'
+        verbose_name_plural = 'расстояния от ресторанов до заказов'
+        unique_together = [
+            ['order', 'restaurant']
+        ]
+
+    def __str__(self):
+        return f"{self.order_id} - {self.restaurant_id}: {self.distance} км"
@@ -0,0 +1,114 @@
+import math
+from collections import defaultdict
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+
+from coordinates.distances import haversine_matrix, pack_coordinates, refine_nearest
+from coordinates.geocoder import get_known_coordinates
+
+from .availability import get_availability_matrix
+from .models import Order, OrderDistance
+from .restaurant_index import get_restaurant_index
+
+
+def _distances_changed(saved_distances, distances):
+    if saved_distances.keys() != distances.keys():
+        return True
+    return any(
+        not math.isclose(saved_distances[restaurant_id], distance, abs_tol=1e-6)
+        for restaurant_id, distance in distances.items()
+    )
+
+
+def get_distance_matrix(orders):
+    """Считает расстояния от заказов до ресторанов, которые могут их приготовить.
+
+    Строки матрицы соответствуют заказам, столбцы — ресторанам индекса.
+    Где ресторан не может приготовить заказ или нет координат, стоит NaN.
+    """
+    restaurant_index = get_restaurant_index()
+    coordinates_for_place = get_known_coordinates(order.address for order in orders)
+    order_coordinates = [coordinates_for_place.get(order.address) for order in orders]
+    distances = haversine_matrix(
+        pack_coordinates(order_coordinates),
+        restaurant_index.points,
+    )
+
+    product_ids_for_order = [
+        {order_item.product_id for order_item in order.items.all()}
+        for order in orders
+    ]
+    product_ids = sorted(set().union(*product_ids_for_order))
+    product_positions = {product_id: position for position, product_id in enumerate(product_ids)}
+    order_products = np.zeros((len(orders), len(product_ids)), dtype=np.int32)
+    for row, order_product_ids in enumerate(product_ids_for_order):
+        order_products[row, [product_positions[product_id] for product_id in order_product_ids]] = 1
+    menu = get_availability_matrix().get_submatrix(product_ids, restaurant_index.restaurant_ids)
+    # Ресторан может приготовить заказ, если в его меню есть все продукты заказа
+    available = (
+        order_products @ menu.astype(np.int32)
+        == order_products.sum(axis=1, keepdims=True)
+    )
+    distances[~available] = np.nan
+
+    distances = refine_nearest(
+        order_coordinates,
+        list(restaurant_index.coordinates_for_restaurant.values()),
+        distances,
+        settings.DISTANCE_GEODESIC_TOP_K,
+    )
+    return restaurant_index.restaurant_ids, distances
+
+
+def refresh_order_distances(orders):
+    order_ids = orders.values('id')
+    orders = list(
+        orders
+        .exclude(status=Order.COMPLETED)
+        .filter(items__isnull=False)
+        .distinct()
+        .prefetch_related('items')
+    )
+
+    distances_for_order = defaultdict(dict)
+    if orders:
+        restaurant_ids, distances = get_distance_matrix(orders)
+        for row, column in zip(*np.nonzero(~np.isnan(distances))):
+            distances_for_order[orders[row].id][int(restaurant_ids[column])] = float(distances[row, column])
+
+    saved_distances_for_order = defaultdict(dict)
+    saved_order_distances = (
+        OrderDistance.objects
+        .filter(order__in=order_ids)
+        .values_list('order_id', 'restaurant_id', 'distance')
+    )
+    for order_id, restaurant_id, distance_to_order in saved_order_distances:
+        saved_distances_for_order[order_id][restaurant_id] = distance_to_order
+
+    # Трогаем только заказы, у которых расстояния действительно поменялись,
+    # иначе каждая правка ресторана помечала бы изменёнными все заказы на доске
+    changed_order_ids = [
+        order_id
+        for order_id in saved_distances_for_order.keys() | distances_for_order.keys()
+        if _distances_changed(
+            saved_distances_for_order.get(order_id, {}),
+            distances_for_order.get(order_id, {}),
+        )
+    ]
+    if not changed_order_ids:
+        return
+
+    with transaction.atomic():
+        OrderDistance.objects.filter(order__in=changed_order_ids).delete()
+        OrderDistance.objects.bulk_create([
+            OrderDistance(
+                order_id=order_id,
+                restaurant_id=restaurant_id,
+                distance=distance_to_order,
+            )
+            for order_id in changed_order_ids
+            for restaurant_id, distance_to_order in distances_for_order.get(order_id, {}).items()
+        ])
+        Order.objects.filter(id__in=changed_order_ids).mark_changed()
@@ -0,0 +1,104 @@
+import threading
+
+import numpy as np
+from django.db import transaction
+
+from coordinates.distances import haversine_distances, pack_coordinates
+from coordinates.models import Place
+
+from .cache_versions import bump_version, get_version
+from .models import Restaurant
+
+
+INDEX_NAME = 'restaurant_index'
+
+
+class RestaurantIndex:
+    def __init__(self, coordinates_for_restaurant):
+        self.coordinates_for_restaurant = dict(coordinates_for_restaurant)
+        self._pack()
+
+    def _pack(self):
+        self.restaurant_ids = np.fromiter(
+            self.coordinates_for_restaurant.keys(),
+            dtype=np.int64,
+            count=len(self.coordinates_for_restaurant),
+        )
+        self.points = pack_coordinates(
+            list(self.coordinates_for_restaurant.values())
+        )
+
+    @classmethod
+    def build(cls):
+        restaurants = Restaurant.objects.exclude(address='').values_list('id', 'address')
+        places = Place.objects.filter(
+            address__in=[address for _, address in restaurants],
+            lat__isnull=False,
+            lon__isnull=False,
+        ).in_bulk(field_name='address')
+        return cls({
+            restaurant_id: places[address].coordinates
+            for restaurant_id, address in restaurants
+            if address in places
+        })
+
+    def update(self, restaurant_id, coordinates):
+        if coordinates:
+            self.coordinates_for_restaurant[restaurant_id] = coordinates
+        else:
+            self.coordinates_for_restaurant.pop(restaurant_id, None)
+        self._pack()
+
+    def nearest(self, coordinates, restaurant_ids=None, k=None):
+        if not coordinates or not len(self.restaurant_ids):
+            return []
+        positions = np.arange(len(self.restaurant_ids))
+        if restaurant_ids is not None:
+            positions = positions[np.isin(self.restaurant_ids, list(restaurant_ids))]
+        distances = haversine_distances(coordinates, self.points[positions])
+        if k is not None and k < len(positions):
+            nearest = np.argpartition(distances, k - 1)[:k]
+            positions, distances = positions[nearest], distances[nearest]
+        order = np.argsort(distances, kind='stable')
+        return [
+            (int(self.restaurant_ids[position]), float(distance))
+            for position, distance in zip(positions[order], distances[order])
+        ]
+
+
+_index = None
+_index_version = None
+_index_lock = threading.Lock()
+
+
+def get_restaurant_index():
+    global _index, _index_version
+    version = get_version(INDEX_NAME)
+    with _index_lock:
+        if _index is None or _index_version != version:
+            _index = RestaurantIndex.build()
+            _index_version = version
+        return _index
+
+
+def _apply_restaurant_index_update(coordinates_for_restaurant):
+    global _index_version
+    new_version = bump_version(INDEX_NAME)
+    with _index_lock:
+        if _index is None:
+            return
+        for restaurant_id, coordinates in coordinates_for_restaurant.items():
+            _index.update(restaurant_id, coordinates)
+        # Обновляем индекс на месте, только если с последней сборки его не
+        # менял другой процесс. Иначе он пересоберётся при следующем запросе.
+        if _index_version == new_version - 1:
+            _index_version = new_version
+
+
+def update_restaurant_index(coordinates_for_restaurant):
+    # До коммита другие процессы пересобрали бы индекс из старых данных
+    # и закэшировали бы его под новой версией
+    coordinates_for_restaurant = dict(coordinates_for_restaurant)
+    transaction.on_commit(
+        lambda: _apply_restaurant_index_update(coordinates_for_restaurant)
+    )
@@ -0,0 +1,200 @@
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from banners.models import Banner, BannerCarousel
+from banners.payloads import BANNER_IMAGE_WIDTHS, BANNERS_VERSION
+from coordinates.geocoder import enqueue_addresses, get_known_coordinates
+from coordinates.signals import addresses_requested, places_updated
+
+from .admin_search import RESTAURANTS_VERSION
+from .availability import MENU_VERSION
+from .cache_versions import bump_version, bump_version_on_commit
+from .catalog import CATALOG_VERSION
+from .commit_hooks import collect_on_commit
+from .models import Order, OrderItem, Product, ProductCategory, Restaurant, RestaurantMenuItem
+from .models import update_order_totals
+from .order_distances import refresh_order_distances
+from .restaurant_index import update_restaurant_index
+from .snapshots import write_banner_snapshots, write_products_snapshot, write_snapshots_on_commit
+from .thumbnails import PRODUCT_IMAGE_WIDTHS, generate_thumbnails
+
+
+@receiver(pre_save, sender=Restaurant)
+def remember_restaurant_address(sender, instance, **kwargs):
+    instance.saved_address = (
+        Restaurant.objects
+        .filter(pk=instance.pk)
+        .values_list('address', flat=True)
+        .first()
+    ) if instance.pk else None
+
+
+def restaurant_address_changed(instance, created):
+    return created or instance.address != instance.saved_address
+
+
+@receiver(pre_save, sender=RestaurantMenuItem)
+def remember_menu_item(sender, instance, **kwargs):
+    instance.saved_menu_item = (
+        RestaurantMenuItem.objects
+        .filter(pk=instance.pk)
+        .values('restaurant_id', 'product_id', 'availability')
+        .first()
+    ) if instance.pk else None
+
+
+def menu_item_availability_changed(instance, created):
+    saved_menu_item = instance.saved_menu_item
+    if created or saved_menu_item is None:
+        return instance.availability
+    if not instance.availability and not saved_menu_item['availability']:
+        return False
+    return saved_menu_item != {
+        'restaurant_id': instance.restaurant_id,
+        'product_id': instance.product_id,
+        'availability': instance.availability,
+    }
+
+
+@receiver(post_save, sender=Order)
+def enqueue_order_address_geocoding(sender, instance, **kwargs):
+    enqueue_addresses([instance.address])
+
+
+@receiver(post_save, sender=Restaurant)
+def enqueue_restaurant_address_geocoding(sender, instance, created, **kwargs):
+    if restaurant_address_changed(instance, created):
+        enqueue_addresses([instance.address])
+
+
+@receiver(addresses_requested)
+def request_open_order_and_restaurant_addresses(sender, **kwargs):
+    return (
+        set(
+            Order.objects
+            .exclude(status=Order.COMPLETED)
+            .values_list('address', flat=True)
+        )
+        | set(Restaurant.objects.values_list('address', flat=True))
+    )
+
+
+@receiver(post_save, sender=Restaurant)
+def update_saved_restaurant_in_index(sender, instance, created, **kwargs):
+    if not restaurant_address_changed(instance, created):
+        return
+    coordinates = get_known_coordinates([instance.address]).get(instance.address)
+    update_restaurant_index({instance.id: coordinates})
+
+
+@receiver(post_delete, sender=Restaurant)
+def remove_deleted_restaurant_from_index(sender, instance, **kwargs):
+    update_restaurant_index({instance.id: None})
+
+
+@receiver(places_updated)
+def update_geocoded_restaurants_in_index(sender, addresses, **kwargs):
+    restaurants = Restaurant.objects.filter(address__in=addresses).values_list('id', 'address')
+    if not restaurants:
+        return
+    coordinates_for_place = get_known_coordinates(addresses)
+    update_restaurant_index({
+        restaurant_id: coordinates_for_place.get(address)
+        for restaurant_id, address in restaurants
+    })
+
+
+def refresh_distances_to_restaurants(restaurant_ids):
+    # Расстояния меняются только у заказов, которые ресторан может приготовить
+    # или до которых расстояние от него уже посчитано
+    refresh_order_distances(Order.objects.filter(
+        Q(
+            items__product__menu_items__restaurant__in=restaurant_ids,
+            items__product__menu_items__availability=True,
+        )
+        | Q(restaurant_distances__restaurant__in=restaurant_ids)
+    ))
+
+
+@receiver(post_save, sender=Restaurant)
+def refresh_distances_to_saved_restaurant(sender, instance, created, **kwargs):
+    if not restaurant_address_changed(instance, created):
+        return
+    # Индекс ресторанов обновится только после коммита, пересчитываем после него
+    collect_on_commit(refresh_distances_to_restaurants, {instance.id})
+
+
+@receiver(post_save, sender=Restaurant)
+@receiver(post_delete, sender=Restaurant)
+def bump_restaurants_version(sender, **kwargs):
+    bump_version_on_commit(RESTAURANTS_VERSION)
+
+
+def refresh_menu(product_ids):
+    bump_version(MENU_VERSION)
+    refresh_order_distances(Order.objects.filter(items__product__in=product_ids))
+
+
+@receiver(post_save, sender=RestaurantMenuItem)
+def refresh_menu_for_saved_item(sender, instance, created, **kwargs):
+    if not menu_item_availability_changed(instance, created):
+        return
+    product_ids = {instance.product_id}
+    if instance.saved_menu_item:
+        product_ids.add(instance.saved_menu_item['product_id'])
+    # Меню ресторана сохраняют пачкой строк: индекс доступности
+    # пересобираем и расстояния пересчитываем один раз после коммита
+    collect_on_commit(refresh_menu, product_ids)
+
+
+@receiver(post_delete, sender=RestaurantMenuItem)
+def refresh_menu_for_deleted_item(sender, instance, **kwargs):
+    if instance.availability:
+        collect_on_commit(refresh_menu, {instance.product_id})
+
+
+@receiver(places_updated)
+def refresh_distances_for_geocoded_places(sender, addresses, **kwargs):
+    restaurant_ids = set(Restaurant.objects.filter(address__in=addresses).values_list('id', flat=True))
+    if restaurant_ids:
+        collect_on_commit(refresh_distances_to_restaurants, restaurant_ids)
+    refresh_order_distances(Order.objects.filter(address__in=addresses))
+
+
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+def update_order_total(sender, instance, **kwargs):
+    collect_on_commit(update_order_totals, {instance.order_id})
+
+
+@receiver(post_save, sender=Product)
+def generate_product_thumbnails(sender, instance, **kwargs):
+    if instance.image:
+        generate_thumbnails(instance.image, PRODUCT_IMAGE_WIDTHS)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductCategory)
+@receiver(post_delete, sender=ProductCategory)
+@receiver(post_save, sender=RestaurantMenuItem)
+@receiver(post_delete, sender=RestaurantMenuItem)
+def bump_catalog_version(sender, **kwargs):
+    bump_version_on_commit(CATALOG_VERSION)
+    write_snapshots_on_commit(write_products_snapshot)
+
+
+@receiver(post_save, sender=Banner)
+def generate_banner_thumbnails(sender, instance, **kwargs):
+    if instance.image:
+        generate_thumbnails(instance.image, BANNER_IMAGE_WIDTHS)
+
+
+@receiver(post_save, sender=Banner)
+@receiver(post_delete, sender=Banner)
+@receiver(post_save, sender=BannerCarousel)
+@receiver(post_delete, sender=BannerCarousel)
+def rewrite_banner_snapshots(sender, **kwargs):
+    bump_version_on_commit(BANNERS_VERSION)
+    write_snapshots_on_commit(write_banner_snapshots)
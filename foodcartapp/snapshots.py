@@ -0,0 +1,124 @@
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+
+import brotli
+from django.conf import settings
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
+
+from banners.models import BannerCarousel
+from banners.payloads import get_banners_payload
+
+from .catalog import get_catalog_json
+from .commit_hooks import on_commit_once
+
+
+SNAPSHOT_ENCODINGS = [
+    ('br', '.br', lambda content: brotli.compress(content, quality=11)),
+    ('gzip', '.gz', lambda content: gzip.compress(content, compresslevel=9)),
+]
+
+
+def _write_file_atomically(path, content):
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=directory, delete=False) as temporary_file:
+        temporary_file.write(content)
+    os.replace(temporary_file.name, path)
+
+
+def get_snapshot_path(name):
+    return os.path.join(settings.API_SNAPSHOTS_ROOT, f'{name}.json')
+
+
+def write_snapshot(name, etag, content):
+    path = get_snapshot_path(name)
+    for _, suffix, compress in SNAPSHOT_ENCODINGS:
+        _write_file_atomically(f'{path}{suffix}', compress(content))
+    _write_file_atomically(path, content)
+    _write_file_atomically(f'{path}.etag', etag.encode())
+
+
+def write_products_snapshot():
+    etag, catalog_json = get_catalog_json()
+    write_snapshot('products', etag, catalog_json)
+
+
+def write_snapshots_on_commit(write_snapshots):
+    # Массовое сохранение в админке шлёт сигнал на каждую запись,
+    # а снимок достаточно пересобрать один раз после коммита
+    on_commit_once(write_snapshots)
+
+
+def write_banner_snapshots():
+    slugs = set(BannerCarousel.objects.values_list('slug', flat=True))
+    for slug in slugs:
+        write_banners_snapshot(slug)
+
+    banners_root = os.path.dirname(get_snapshot_path('banners/slug'))
+    if not os.path.isdir(banners_root):
+        return
+    for file_name in os.listdir(banners_root):
+        if file_name.split('.')[0] not in slugs:
+            os.remove(os.path.join(banners_root, file_name))
+
+
+def write_banners_snapshot(slug):
+    banners_json = json.dumps(
+        get_banners_payload(slug),
+        ensure_ascii=False,
+    ).encode()
+    etag = f'"banners-{slug}-{hashlib.sha256(banners_json).hexdigest()[:16]}"'
+    write_snapshot(f'banners/{slug}', etag, banners_json)
+
+
+def get_accepted_encodings(request):
+    accepted_encodings = set()
+    for encoding in request.headers.get('Accept-Encoding', '').split(','):
+        encoding, _, params = encoding.strip().partition(';')
+        if params.replace(' ', '') in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            continue
+        accepted_encodings.add(encoding.lower())
+    return accepted_encodings
+
+
+def get_encoded_etag(etag, encoding):
+    if not encoding:
+        return etag
+    return f'{etag[:-1]}-{encoding}"'
+
+
+def serve_snapshot(request, name):
+    path = get_snapshot_path(name)
+    with open(f'{path}.etag') as etag_file:
+        etag = etag_file.read()
+
+    accepted_encodings = get_accepted_encodings(request)
+    content_encoding, suffix = None, ''
+    for encoding, encoding_suffix, _ in SNAPSHOT_ENCODINGS:
+        if encoding in accepted_encodings:
+            content_encoding, suffix = encoding, encoding_suffix
+            break
+
+    # Сильный ETag не может совпадать у разных байтовых представлений,
+    # поэтому у каждого сжатого варианта свой
+    if_none_match = parse_etags(request.headers.get('If-None-Match', ''))
+    if '*' in if_none_match or any(
+        get_encoded_etag(etag, encoding) in if_none_match
+        for encoding in [None, *(encoding for encoding, _, _ in SNAPSHOT_ENCODINGS)]
+    ):
+        response = HttpResponseNotModified()
+    else:
+        response = FileResponse(
+            open(f'{path}{suffix}', 'rb'),
+            content_type='application/json',
+        )
+        if content_encoding:
+            response['Content-Encoding'] = content_encoding
+    response['ETag'] = get_encoded_etag(etag, content_encoding)
+    response['Vary'] = 'Accept-Encoding'
+    response['Cache-Control'] = 'no-cache'
+    return response
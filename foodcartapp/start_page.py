@@ -0,0 +1,37 @@
+import json
+
+from django.core.cache import cache
+
+from banners.payloads import BANNERS_VERSION, get_banners_payload
+
+from .cache_versions import get_version
+from .catalog import CATALOG_CACHE_TIMEOUT, CATALOG_VERSION, get_catalog_json
+
+
+START_PAGE_BANNERS_SLUG = 'start-page-header'
+
+# Данные встраиваются прямо в <script>, поэтому экранируем символы разметки
+_SCRIPT_ESCAPES = {
+    ord('<'): '\\u003C',
+    ord('>'): '\\u003E',
+    ord('&'): '\\u0026',
+}
+
+
+def get_start_page_json():
+    cache_key = (
+        f'foodcartapp:start_page:{get_version(CATALOG_VERSION)}:'
+        f'{get_version(BANNERS_VERSION)}'
+    )
+    start_page_json = cache.get(cache_key)
+    if start_page_json is None:
+        _, catalog_json = get_catalog_json()
+        banners_json = json.dumps(
+            get_banners_payload(START_PAGE_BANNERS_SLUG),
+            ensure_ascii=False,
+        )
+        start_page_json = (
+            f'{{"products": {catalog_json.decode()}, "banners": {banners_json}}}'
+        ).translate(_SCRIPT_ESCAPES)
+        cache.set(cache_key, start_page_json, timeout=CATALOG_CACHE_TIMEOUT)
+    return start_page_json
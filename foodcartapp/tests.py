@@ -0,0 +1,228 @@
+import json
+
+from django.db import transaction
+from django.test import RequestFactory, TestCase
+
+from .availability import MENU_VERSION
+from .cache_versions import bump_version
+from .commit_hooks import collect_on_commit, on_commit_once
+from .models import Order, OrderItem, Product, ProductCategory, Restaurant, RestaurantMenuItem
+from .views import register_order, register_order_with_serializer
+
+
+VALID_ORDER = {
+    'firstname': 'Иван',
+    'lastname': 'Петров',
+    'address': 'Москва, Новый Арбат, 10',
+    'phonenumber': '+79291000000',
+}
+
+
+class RegisterOrderTest(TestCase):
+    """Быстрый путь регистрации заказа должен отвечать так же, как OrderSerializer."""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = ProductCategory.objects.create(name='Бургеры')
+        restaurant = Restaurant.objects.create(name='Star Burger', address='Москва, Тверская, 1')
+        cls.burger = Product.objects.create(name='Бургер', category=category, price=300)
+        cls.fries = Product.objects.create(name='Картошка', category=category, price=100)
+        cls.unavailable = Product.objects.create(name='Суп', category=category, price=200)
+        for product, availability in [
+            (cls.burger, True),
+            (cls.fries, True),
+            (cls.unavailable, False),
+        ]:
+            RestaurantMenuItem.objects.create(
+                restaurant=restaurant,
+                product=product,
+                availability=availability,
+            )
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def post(self, view, body):
+        request = self.factory.post('/api/order/', data=body, content_type='application/json')
+        response = view(request)
+        if hasattr(response, 'render'):
+            response.render()
+        return response.status_code, response.content
+
+    def assertSameResponses(self, payloads):
+        for payload in payloads:
+            body = payload if isinstance(payload, str) else json.dumps(payload)
+            with self.subTest(body=body):
+                self.assertEqual(
+                    self.post(register_order, body),
+                    self.post(register_order_with_serializer, body),
+                )
+
+    def test_valid_orders(self):
+        burger, fries = self.burger.id, self.fries.id
+        payloads = [
+            {**VALID_ORDER, 'products': [{'product': burger, 'quantity': 1}]},
+            {**VALID_ORDER, 'products': [
+                {'product': burger, 'quantity': 2},
+                {'product': fries, 'quantity': 3},
+                {'product': burger, 'quantity': 1},
+            ]},
+            {**VALID_ORDER, 'phonenumber': '8 929 100-00-00', 'products': [
+                {'product': str(fries), 'quantity': '2'},
+            ]},
+            {**VALID_ORDER, 'comment': 'лишнее поле', 'products': [
+                {'product': burger, 'quantity': 1, 'price': 1},
+            ]},
+        ]
+
+        self.assertSameResponses(payloads)
+        self.assertEqual(Order.objects.count(), 2 * len(payloads))
+
+    def test_invalid_orders(self):
+        burger = self.burger.id
+        products = [{'product': burger, 'quantity': 1}]
+        payloads = [
+            '{"firstname": ',
+            '',
+            'null',
+            '[]',
+            '"order"',
+            {},
+            {'products': products},
+            {**VALID_ORDER},
+            {**VALID_ORDER, 'products': None},
+            {**VALID_ORDER, 'products': []},
+            {**VALID_ORDER, 'products': 'бургер'},
+            {**VALID_ORDER, 'products': {'product': burger}},
+            {**VALID_ORDER, 'products': [None]},
+            {**VALID_ORDER, 'products': ['бургер', 1]},
+            {**VALID_ORDER, 'products': [{}]},
+            {**VALID_ORDER, 'products': [{'product': burger}]},
+            {**VALID_ORDER, 'products': [{'product': burger, 'quantity': 0}]},
+            {**VALID_ORDER, 'products': [{'product': burger, 'quantity': -1}]},
+            {**VALID_ORDER, 'products': [{'product': burger, 'quantity': 'два'}]},
+            {**VALID_ORDER, 'products': [{'product': burger, 'quantity': None}]},
+            {**VALID_ORDER, 'products': [{'product': True, 'quantity': 1}]},
+            {**VALID_ORDER, 'products': [{'product': 'бургер', 'quantity': 1}]},
+            {**VALID_ORDER, 'products': [{'product': None, 'quantity': 1}]},
+            {**VALID_ORDER, 'products': [{'product': [burger], 'quantity': 1}]},
+            {**VALID_ORDER, 'products': [{'product': 999999, 'quantity': 1}]},
+            {**VALID_ORDER, 'products': [
+                {'product': burger, 'quantity': 1},
+                {'product': self.unavailable.id, 'quantity': 1},
+            ]},
+            {**VALID_ORDER, 'firstname': None, 'products': products},
+            {**VALID_ORDER, 'firstname': '', 'products': products},
+            {**VALID_ORDER, 'firstname': ['Иван'], 'products': products},
+            {**VALID_ORDER, 'lastname': 'П' * 100, 'products': products},
+            {**VALID_ORDER, 'address': {}, 'products': products},
+            {**VALID_ORDER, 'phonenumber': '', 'products': products},
+            {**VALID_ORDER, 'phonenumber': None, 'products': products},
+            {**VALID_ORDER, 'phonenumber': '12345', 'products': products},
+            {**VALID_ORDER, 'phonenumber': '+70000000000', 'products': products},
+            {'firstname': 1, 'lastname': 2, 'address': 3, 'phonenumber': 4, 'products': 5},
+        ]
+
+        self.assertSameResponses(payloads)
+        self.assertFalse(Order.objects.exists())
+
+
+class AvailableRestaurantsTest(TestCase):
+    """Запрос с GROUP BY/HAVING должен находить те же рестораны, что индекс доступности."""
+
+    @classmethod
+    def setUpTestData(cls):
+        burger, fries, soup = [
+            Product.objects.create(name=name, price=100)
+            for name in ['Бургер', 'Картошка', 'Суп']
+        ]
+        first, second, third = [
+            Restaurant.objects.create(name=name)
+            for name in ['Первый', 'Второй', 'Третий']
+        ]
+        for restaurant, product, availability in [
+            (first, burger, True),
+            (first, fries, True),
+            (first, soup, False),
+            (second, burger, True),
+            (second, soup, True),
+            (third, fries, True),
+            (third, soup, False),
+        ]:
+            RestaurantMenuItem.objects.create(
+                restaurant=restaurant,
+                product=product,
+                availability=availability,
+            )
+
+        for products in [
+            [burger],
+            [burger, burger],
+            [burger, fries, burger],
+            [fries, fries],
+            [soup],
+            [burger, soup],
+            [],
+        ]:
+            order = Order.objects.create(
+                firstname='Иван',
+                lastname='Петров',
+                address='Москва',
+                phonenumber='+79291000000',
+            )
+            for product in products:
+                OrderItem.objects.create(order=order, product=product, quantity=1, price=100)
+
+    def setUp(self):
+        # Версия меню поднимается после коммита, а тест коммитов не делает
+        bump_version(MENU_VERSION)
+
+    def assertSameRestaurants(self, orders):
+        expected = {
+            order.id: {restaurant.id for restaurant in order.available_restaurants}
+            for order in orders.prefetch_related('items').with_available_restaurants()
+        }
+        restaurant_ids_for_order = orders.get_available_restaurant_ids()
+        self.assertEqual(
+            {
+                order_id: restaurant_ids_for_order.get(order_id, set())
+                for order_id in expected
+            },
+            expected,
+        )
+        self.assertLessEqual(restaurant_ids_for_order.keys(), expected.keys())
+
+    def test_matches_availability_index(self):
+        self.assertSameRestaurants(Order.objects.order_by('id'))
+
+    def test_sliced_queryset(self):
+        self.assertSameRestaurants(Order.objects.order_by('-id')[:4])
+
+
+class CommitHooksTest(TestCase):
+    def test_runs_callback_once_per_transaction(self):
+        calls = []
+
+        def write_snapshot():
+            calls.append('snapshot')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            for item in [1, 2, 2, 3]:
+                on_commit_once(write_snapshot)
+                collect_on_commit(calls.append, [item])
+
+        self.assertEqual(calls, ['snapshot', {1, 2, 3}])
+
+    def test_rolled_back_callback_does_not_block_next_one(self):
+        calls = []
+
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    collect_on_commit(calls.append, [1])
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+            collect_on_commit(calls.append, [2])
+
+        self.assertEqual(calls, [{2}])
@@ -0,0 +1,98 @@
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, features
+
+
+PRODUCT_IMAGE_WIDTHS = (160, 320, 640)
+EXIF_ORIENTATION = 0x0112
+
+THUMBNAIL_FORMATS = {
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+if features.check('webp'):
+    THUMBNAIL_FORMATS['webp'] = ('WEBP', {'quality': 80, 'method': 6})
+THUMBNAIL_EXTENSIONS = {
+    'webp': 'webp',
+    'jpeg': 'jpg',
+}
+
+
+def get_thumbnail_name(image_name, width, image_format):
+    root, _ = os.path.splitext(image_name)
+    return f'{root}.{width}w.{THUMBNAIL_EXTENSIONS[image_format]}'
+
+
+def get_thumbnail_names(image_name, widths):
+    return [
+        get_thumbnail_name(image_name, width, image_format)
+        for width in widths
+        for image_format in THUMBNAIL_FORMATS
+    ]
+
+
+def get_original_width(image):
+    width, height = image.size
+    # Снимок, повёрнутый по EXIF, после exif_transpose меняет ширину с высотой
+    if image.getexif().get(EXIF_ORIENTATION) in (5, 6, 7, 8):
+        return height
+    return width
+
+
+def generate_thumbnails(image, widths, overwrite=False):
+    storage = image.storage
+    if not storage.exists(image.name):
+        return
+
+    with image.open('rb') as image_file:
+        original = Image.open(image_file)
+        # Image.thumbnail не увеличивает картинку: копия не уже оригинала
+        # вышла бы с неверной шириной в srcset, поэтому таких не делаем
+        original_width = get_original_width(original)
+        for name in get_thumbnail_names(
+            image.name,
+            [width for width in widths if width >= original_width],
+        ):
+            if storage.exists(name):
+                storage.delete(name)
+        widths = [width for width in widths if width < original_width]
+        thumbnail_names = get_thumbnail_names(image.name, widths)
+        if not overwrite and all(storage.exists(name) for name in thumbnail_names):
+            return
+        original = ImageOps.exif_transpose(original).convert('RGB')
+
+    for width in widths:
+        thumbnail = original.copy()
+        thumbnail.thumbnail((width, original.height), Image.Resampling.LANCZOS)
+        for image_format, (pil_format, save_options) in THUMBNAIL_FORMATS.items():
+            content = BytesIO()
+            thumbnail.save(content, pil_format, **save_options)
+            name = get_thumbnail_name(image.name, width, image_format)
+            if storage.exists(name):
+                storage.delete(name)
+            storage.save(name, ContentFile(content.getvalue()))
+
+
+def get_srcsets(image, widths):
+    storage = image.storage
+    widths = [
+        width for width in widths
+        if all(storage.exists(name) for name in get_thumbnail_names(image.name, [width]))
+    ]
+    if not widths:
+        return None
+    return {
+        image_format: ', '.join(
+            f'{storage.url(get_thumbnail_name(image.name, width, image_format))} {width}w'
+            for width in widths
+        )
+        for image_format in THUMBNAIL_FORMATS
+    }
+
+
+def get_smallest_thumbnail_url(image, widths, image_format='jpeg'):
+    name = get_thumbnail_name(image.name, min(widths), image_format)
+    if not image.storage.exists(name):
+        return image.url
+    return image.storage.url(name)
@@ -1,62 +1,105 @@
+from functools import lru_cache
+
 import phonenumbers
 from django.db import transaction
 from django.http import JsonResponse
+from django.shortcuts import render
 from django.templatetags.static import static
+from django.views.decorators.csrf import csrf_exempt
 from rest_framework import serializers
 from rest_framework.decorators import api_view
+from rest_framework.fields import empty
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils import json
+
+from coordinates.geocoder import enqueue_addresses
 
-from .models import Product, Order, OrderItem
-from banners.models import Banner
+from .models import Order, OrderItem, Product
+from .order_distances import refresh_order_distances
+from .snapshots import serve_snapshot, write_banners_snapshot, write_products_snapshot
+from .start_page import get_start_page_json
+from banners.models import BannerCarousel
 
 
-class BannerSerializer(serializers.Serializer):
-    title = serializers.CharField(max_length=50)
-    src = serializers.URLField(source='image.url')
-    text = serializers.CharField()
+def start_page(request):
+    return render(request, 'index.html', context={
+        'start_page_json': get_start_page_json(),
+    })
 
 
-@api_view()
 def banners_list_api(request, slug):
-    banners = Banner.objects.filter(place__slug=slug)
-    serializer = BannerSerializer(banners, many=True)
-    return Response(serializer.data)
+    try:
+        return serve_snapshot(request, f'banners/{slug}')
+    except FileNotFoundError:
+        pass
+    if not BannerCarousel.objects.filter(slug=slug).exists():
+        return JsonResponse([], safe=False)
+    write_banners_snapshot(slug)
+    return serve_snapshot(request, f'banners/{slug}')
 
 
 def product_list_api(request):
-    products = Product.objects.select_related('category').available()
-
-    dumped_products = []
-    for product in products:
-        dumped_product = {
-            'id': product.id,
-            'name': product.name,
-            'price': product.price,
-            'special_status': product.special_status,
-            'description': product.description,
-            'category': {
-                'id': product.category.id,
-                'name': product.category.name,
-            } if product.category else None,
-            'image': product.image.url,
-            'restaurant': {
-                'id': product.id,
-                'name': product.name,
-            }
-        }
-        dumped_products.append(dumped_product)
-    return JsonResponse(dumped_products, safe=False, json_dumps_params={
-        'ensure_ascii': False,
-        'indent': 4,
-    })
+    try:
+        return serve_snapshot(request, 'products')
+    except FileNotFoundError:
+        write_products_snapshot()
+        return serve_snapshot(request, 'products')
+
+
+ORDER_BATCH_MAX_SIZE = 500
+
+
+@lru_cache(maxsize=10000)
+def normalize_phonenumber(phonenumber):
+    try:
+        parsed_phone_number = phonenumbers.parse(phonenumber, 'RU')
+    except phonenumbers.NumberParseException:
+        return None
+    if not phonenumbers.is_valid_number(parsed_phone_number):
+        return None
+    return phonenumbers.format_number(
+        parsed_phone_number,
+        phonenumbers.PhoneNumberFormat.E164
+    )
+
+
+class ProductPrimaryKeyField(serializers.PrimaryKeyRelatedField):
+    # Проверяет только тип ключа: сами товары OrderSerializer загружает
+    # одним запросом на весь заказ
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            return int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
 
 
 class OrderItemSerializer(serializers.ModelSerializer):
+    product = ProductPrimaryKeyField(queryset=Product.objects.all())
+
     class Meta:
         model = OrderItem
         fields = ['product', 'quantity']
 
 
+def resolve_order_products(order_items_details, products, product_field):
+    errors = []
+    for order_item_details in order_items_details:
+        product_id = order_item_details['product']
+        if product_id in products:
+            order_item_details['product'] = products[product_id]
+            errors.append({})
+        else:
+            errors.append({'product': [
+                product_field.error_messages['does_not_exist'].format(
+                    pk_value=product_id
+                )
+            ]})
+    return errors if any(errors) else None
+
+
 class OrderSerializer(serializers.ModelSerializer):
     products = OrderItemSerializer(many=True, allow_empty=False, source='items')
 
@@ -70,25 +113,35 @@ class OrderSerializer(serializers.ModelSerializer):
         }
 
     def validate_phonenumber(self, value):
-        try:
-            parsed_phone_number = phonenumbers.parse(
-                value,
-                'RU'
-            )
-        except phonenumbers.NumberParseException:
-            raise serializers.ValidationError(['Некорректный номер телефона'])
-        if not phonenumbers.is_valid_number(parsed_phone_number):
+        normalized_phone_number = normalize_phonenumber(value)
+        if normalized_phone_number is None:
             raise serializers.ValidationError(['Некорректный номер телефона'])
-        normalized_phone_number = phonenumbers.format_number(
-            parsed_phone_number,
-            phonenumbers.PhoneNumberFormat.E164
-        )
         return normalized_phone_number
 
+    def validate_products(self, order_items_details):
+        products = self.context.get('products')
+        if products is None:
+            products = Product.objects.available().in_bulk({
+                order_item_details['product']
+                for order_item_details in order_items_details
+            })
+        errors = resolve_order_products(
+            order_items_details,
+            products,
+            self.fields['products'].child.fields['product'],
+        )
+        if errors:
+            raise serializers.ValidationError(errors)
+        return order_items_details
+
     @transaction.atomic
     def create(self, validated_data):
         order_items_details = validated_data.pop('items')
-        order = Order.objects.create(**validated_data)
+        total = sum(
+            order_item_details['product'].price * order_item_details['quantity']
+            for order_item_details in order_items_details
+        )
+        order = Order.objects.create(total=total, **validated_data)
         order_items = []
         for order_item_details in order_items_details:
             order_items.append(OrderItem(
@@ -97,12 +150,252 @@ class OrderSerializer(serializers.ModelSerializer):
                 **order_item_details
             ))
         OrderItem.objects.bulk_create(order_items)
+        refresh_order_distances(Order.objects.filter(pk=order.pk))
         return order
 
 
+def get_batch_product_ids(orders_details):
+    product_ids = set()
+    for order_details in orders_details:
+        if not isinstance(order_details, dict):
+            continue
+        order_items_details = order_details.get('products')
+        if not isinstance(order_items_details, list):
+            continue
+        for order_item_details in order_items_details:
+            if not isinstance(order_item_details, dict):
+                continue
+            product_id = order_item_details.get('product')
+            if isinstance(product_id, bool):
+                continue
+            try:
+                product_ids.add(int(product_id))
+            except (TypeError, ValueError):
+                continue
+    return product_ids
+
+
+@transaction.atomic
+def create_orders(validated_orders):
+    orders = []
+    order_items = []
+    for validated_data in validated_orders:
+        validated_data = dict(validated_data)
+        order_items_details = validated_data.pop('items')
+        order = Order(
+            total=sum(
+                order_item_details['product'].price * order_item_details['quantity']
+                for order_item_details in order_items_details
+            ),
+            **validated_data
+        )
+        orders.append(order)
+        order_items.append([
+            OrderItem(price=order_item_details['product'].price, **order_item_details)
+            for order_item_details in order_items_details
+        ])
+    Order.objects.bulk_create(orders)
+    for order, items in zip(orders, order_items):
+        for order_item in items:
+            order_item.order = order
+    OrderItem.objects.bulk_create([
+        order_item for items in order_items for order_item in items
+    ])
+    enqueue_addresses(order.address for order in orders)
+    created_orders = Order.objects.filter(pk__in=[order.pk for order in orders])
+    created_orders.mark_changed()
+    refresh_order_distances(created_orders)
+    return orders
+
+
+class OrderRules:
+    """Проверки OrderSerializer, собранные один раз для быстрой регистрации заказа.
+
+    Поля сериализатора создаются заранее и переиспользуются, поэтому ошибки
+    совпадают с ответами OrderSerializer слово в слово.
+    """
+
+    def __init__(self, serializer):
+        self.messages = serializer.error_messages
+        self.fields = [
+            (name, field)
+            for name, field in serializer.fields.items()
+            if name != 'products'
+        ]
+        products_field = serializer.fields['products']
+        self.products_messages = products_field.error_messages
+        self.item_messages = products_field.child.error_messages
+        self.item_fields = list(products_field.child.fields.items())
+        self.product_field = products_field.child.fields['product']
+
+    def validate_order_items(self, order_items_details):
+        if order_items_details is empty:
+            return None, [self.products_messages['required']]
+        if order_items_details is None:
+            return None, [self.products_messages['null']]
+        if not isinstance(order_items_details, list):
+            return None, {api_settings.NON_FIELD_ERRORS_KEY: [
+                self.products_messages['not_a_list'].format(
+                    input_type=type(order_items_details).__name__
+                )
+            ]}
+        if not order_items_details:
+            return None, {api_settings.NON_FIELD_ERRORS_KEY: [
+                self.products_messages['empty']
+            ]}
+
+        validated_items = []
+        errors = []
+        for order_item_details in order_items_details:
+            if order_item_details is None:
+                errors.append([self.item_messages['null']])
+                continue
+            if not isinstance(order_item_details, dict):
+                errors.append({api_settings.NON_FIELD_ERRORS_KEY: [
+                    self.item_messages['invalid'].format(
+                        datatype=type(order_item_details).__name__
+                    )
+                ]})
+                continue
+            validated_item, item_errors = self.validate_fields(
+                order_item_details,
+                self.item_fields,
+            )
+            validated_items.append(validated_item)
+            errors.append(item_errors)
+        if any(errors):
+            return None, errors
+        return validated_items, None
+
+    def validate_fields(self, data, fields):
+        validated_data = {}
+        errors = {}
+        for name, field in fields:
+            try:
+                validated_data[name] = field.run_validation(data.get(name, empty))
+            except serializers.ValidationError as exc:
+                errors[name] = exc.detail
+        return validated_data, errors
+
+    def validate(self, data):
+        if data is None:
+            return None, {api_settings.NON_FIELD_ERRORS_KEY: ['No data provided']}
+        if not isinstance(data, dict):
+            return None, {api_settings.NON_FIELD_ERRORS_KEY: [
+                self.messages['invalid'].format(datatype=type(data).__name__)
+            ]}
+
+        validated_data, errors = self.validate_fields(data, self.fields)
+        if 'phonenumber' in validated_data:
+            phonenumber = normalize_phonenumber(validated_data['phonenumber'])
+            if phonenumber is None:
+                errors['phonenumber'] = ['Некорректный номер телефона']
+            validated_data['phonenumber'] = phonenumber
+
+        order_items_details, products_errors = self.validate_order_items(
+            data.get('products', empty)
+        )
+        if order_items_details is not None:
+            products = Product.objects.available().in_bulk({
+                order_item_details['product']
+                for order_item_details in order_items_details
+            })
+            products_errors = resolve_order_products(
+                order_items_details,
+                products,
+                self.product_field,
+            )
+        if products_errors:
+            errors['products'] = products_errors
+        if errors:
+            return None, errors
+        validated_data['items'] = order_items_details
+        return validated_data, None
+
+
+ORDER_RULES = OrderRules(OrderSerializer())
+
+
 @api_view(['POST'])
-def register_order(request):
+def register_order_with_serializer(request):
     serializer = OrderSerializer(data=request.data)
     serializer.is_valid(raise_exception=True)
     serializer.save()
     return Response(serializer.data)
+
+
+@csrf_exempt
+def register_order(request):
+    # Формы и браузерный API DRF по-прежнему обслуживает OrderSerializer
+    if request.method != 'POST' or request.content_type != 'application/json':
+        return register_order_with_serializer(request)
+
+    json_dumps_params = {'ensure_ascii': False, 'separators': (',', ':')}
+    try:
+        data = json.loads(request.body.decode()) if request.body else {}
+    except ValueError as exc:
+        return JsonResponse(
+            {'detail': f'JSON parse error - {exc}'},
+            status=400,
+            json_dumps_params=json_dumps_params,
+        )
+
+    validated_data, errors = ORDER_RULES.validate(data)
+    if errors:
+        return JsonResponse(errors, status=400, json_dumps_params=json_dumps_params)
+
+    create_orders([validated_data])
+    return JsonResponse(
+        {
+            'firstname': validated_data['firstname'],
+            'lastname': validated_data['lastname'],
+            'address': validated_data['address'],
+            'phonenumber': validated_data['phonenumber'],
+            'products': [
+                {
+                    'product': order_item_details['product'].id,
+                    'quantity': order_item_details['quantity'],
+                }
+                for order_item_details in validated_data['items']
+            ],
+        },
+        json_dumps_params=json_dumps_params,
+    )
+
+
+@api_view(['POST'])
+def register_orders_batch(request):
+    orders_details = request.data
+    if not isinstance(orders_details, list):
+        raise serializers.ValidationError({
+            'non_field_errors': ['Ожидался список заказов.'],
+        })
+    if len(orders_details) > ORDER_BATCH_MAX_SIZE:
+        raise serializers.ValidationError({
+            'non_field_errors': [
+                f'Нельзя передать больше {ORDER_BATCH_MAX_SIZE} заказов за раз.'
+            ],
+        })
+
+    products = Product.objects.available().in_bulk(
+        get_batch_product_ids(orders_details)
+    )
+    results = []
+    validated_orders = []
+    for order_details in orders_details:
+        serializer = OrderSerializer(
+            data=order_details,
+            context={'products': products},
+        )
+        if serializer.is_valid():
+            validated_orders.append(serializer.validated_data)
+            results.append(None)
+        else:
+            results.append({'errors': serializer.errors})
+
+    orders = iter(create_orders(validated_orders) if validated_orders else [])
+    results = [
+        result if result is not None else {'id': next(orders).id}
+        for result in results
+    ]
+    return Response(results)
@@ -1,19 +1,27 @@
+import json
 from collections import defaultdict
-
-import requests
-from geopy import distance
+from datetime import datetime
 
 from django import forms
-from django.conf import settings
 from django.contrib.auth import authenticate, login
 from django.contrib.auth import views as auth_views
 from django.contrib.auth.decorators import user_passes_test
+from django.db.models import Q
+from django.http import JsonResponse
 from django.shortcuts import redirect, render
-from django.urls import reverse_lazy
+from django.template.loader import render_to_string
+from django.urls import reverse, reverse_lazy
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
 from django.views import View
 
-from coordinates.models import Place
-from foodcartapp.models import Product, Restaurant, Order, RestaurantMenuItem
+from foodcartapp.availability import get_availability_matrix
+from foodcartapp.models import Product, Restaurant, Order, OrderChangeCounter, RestaurantMenuItem
+
+
+ORDERS_PAGE_SIZE = 50
+ORDERS_PAGE_MAX_SIZE = 200
+ORDERS_CHANGES_MAX_COUNT = 200
+ORDERS_CHANGES_POLL_INTERVAL = 5
 
 
 class Login(forms.Form):
@@ -71,24 +79,15 @@ def is_manager(user):
 @user_passes_test(is_manager, login_url='restaurateur:login')
 def view_products(request):
     restaurants = list(Restaurant.objects.order_by('name'))
-    products = list(Product.objects.prefetch_related('menu_items'))
-
-    default_availability = {restaurant.id: False for restaurant in restaurants}
-    products_with_restaurants = []
-    for product in products:
-
-        availability = {
-            **default_availability,
-            **{item.restaurant_id: item.availability for item in product.menu_items.all()},
-        }
-        orderer_availability = [availability[restaurant.id] for restaurant in restaurants]
+    products = list(Product.objects.select_related('category'))
 
-        products_with_restaurants.append(
-            (product, orderer_availability)
-        )
+    availability_matrix = get_availability_matrix().get_submatrix(
+        [product.id for product in products],
+        [restaurant.id for restaurant in restaurants],
+    )
 
     return render(request, template_name="products_list.html", context={
-        'products_with_restaurants': products_with_restaurants,
+        'products_with_restaurants': zip(products, availability_matrix.tolist()),
         'restaurants': restaurants,
     })
 
@@ -100,76 +99,187 @@ def view_restaurants(request):
     })
 
 
-def fetch_coordinates(address):
-    geocoder_api_key = settings.YANDEX_GEOCODER_KEY
-    base_url = "https://geocode-maps.yandex.ru/1.x"
-    response = requests.get(base_url, params={
-        "geocode": address,
-        "apikey": geocoder_api_key,
-        "format": "json",
-    })
-    response.raise_for_status()
-    found_places = response.json()['response']['GeoObjectCollection']['featureMember']
+class OrdersFilter(forms.Form):
+    status = forms.ChoiceField(
+        label='Статус',
+        required=False,
+        choices=[('', 'Все незавершённые'), *Order.ORDER_STATUS_CHOICES],
+        widget=forms.Select(attrs={'class': 'form-control'}),
+    )
+    payment_method = forms.ChoiceField(
+        label='Способ оплаты',
+        required=False,
+        choices=[('', 'Любой'), *Order.ORDER_PAYMENT_CHOICES],
+        widget=forms.Select(attrs={'class': 'form-control'}),
+    )
+    restaurant = forms.ModelChoiceField(
+        label='Ресторан',
+        required=False,
+        queryset=Restaurant.objects.order_by('name'),
+        empty_label='Любой',
+        widget=forms.Select(attrs={'class': 'form-control'}),
+    )
+    limit = forms.IntegerField(
+        label='Заказов на странице',
+        required=False,
+        min_value=1,
+        max_value=ORDERS_PAGE_MAX_SIZE,
+        widget=forms.NumberInput(attrs={'class': 'form-control'}),
+    )
+    cursor = forms.CharField(
+        required=False,
+        widget=forms.HiddenInput,
+    )
+
+    def clean_cursor(self):
+        cursor = self.cleaned_data['cursor']
+        if not cursor:
+            return None
+        try:
+            status, registered_at, order_id = json.loads(
+                urlsafe_base64_decode(cursor)
+            )
+            return status, datetime.fromisoformat(registered_at), int(order_id)
+        except (TypeError, ValueError):
+            raise forms.ValidationError('Некорректный курсор')
 
-    if not found_places:
-        return None
 
-    most_relevant = found_places[0]
-    lon, lat = most_relevant['GeoObject']['Point']['pos'].split(" ")
-    return lon, lat
+def encode_orders_cursor(order):
+    return urlsafe_base64_encode(json.dumps([
+        order.status,
+        order.registered_at.isoformat(),
+        order.id,
+    ]).encode())
 
 
-def get_coordinates(address):
-    place, created = Place.objects.get_or_create(
-        address=address
-    )
-    if created:
-        coordinates = fetch_coordinates(address)
-        if not coordinates:
-            place.delete()
-            return None
-        lon, lat = coordinates
-        place.lon = lon
-        place.lat = lat
-        place.save()
-    return place.lat, place.lon
+def filter_orders_page(orders, filters):
+    if filters['status']:
+        orders = orders.filter(status=filters['status'])
+    else:
+        orders = orders.exclude(status=Order.COMPLETED)
+    if filters['payment_method']:
+        orders = orders.filter(payment_method=filters['payment_method'])
+    if filters['restaurant']:
+        orders = orders.filter(restaurant=filters['restaurant'])
+
+    orders = orders.order_by('-status', 'registered_at', 'id')
+    if filters['cursor']:
+        status, registered_at, order_id = filters['cursor']
+        orders = orders.filter(
+            Q(status__lt=status)
+            | Q(status=status, registered_at__gt=registered_at)
+            | Q(status=status, registered_at=registered_at, id__gt=order_id)
+        )
+    return orders
+
+
+def get_orders_filters(filters_form):
+    # Неверное поле сбрасываем к значению по умолчанию, остальные фильтры оставляем
+    filters_form.is_valid()
+    return {
+        field: filters_form.cleaned_data.get(field)
+        for field in filters_form.fields
+    }
+
+
+def add_restaurants_with_distances(orders):
+    for order in orders:
+        distance_for_restaurant = {
+            order_distance.restaurant_id: order_distance.distance
+            for order_distance in order.restaurant_distances.all()
+        }
+        sorted_restaurants = sorted(
+            order.available_restaurants,
+            key=lambda restaurant: distance_for_restaurant.get(restaurant.id, float('inf'))
+        )
+        order.restaurants_with_distances = []
+        for restaurant in sorted_restaurants:
+            distance_to_order = distance_for_restaurant.get(restaurant.id)
+            if distance_to_order is None:
+                distance_to_order = 'Ошибка геокодера'
+            else:
+                distance_to_order = f'{round(distance_to_order, 3)} км'
+            order.restaurants_with_distances.append((restaurant, distance_to_order))
 
 
 @user_passes_test(is_manager, login_url='restaurateur:login')
 def view_orders(request):
-    orders_to_show = (Order.objects
-                           .with_order_sum()
-                           .order_by('-status')
-                           .exclude(status=Order.COMPLETED)
-                           .with_available_restaurants())
-    addresses = set()
-    all_restaurants = Restaurant.objects.all()
-    for restaurant in all_restaurants:
-        addresses.add(restaurant.address)
-    for order in orders_to_show:
-        addresses.add(order.address)
-    places = Place.objects.filter(address__in=addresses)
-    coordinates_for_place = {}
-    for place in places:
-        coordinates_for_place[place.address] = (place.lat, place.lon)
-    for restaurant in all_restaurants:
-        if restaurant.address not in coordinates_for_place:
-            coordinates_for_place[restaurant.address] = \
-                get_coordinates(restaurant.address)
-    for order in orders_to_show:
-        order_coordinates = coordinates_for_place.get(order.address)
-        if not order_coordinates:
-            order_coordinates = get_coordinates(order.address)
-        for restaurant in order.available_restaurants:
-            restaurant.coordinates = coordinates_for_place[restaurant.address]
-            if order_coordinates and restaurant.coordinates:
-                distance_to_order = distance.distance(
-                    order_coordinates,
-                    restaurant.coordinates
-                ).km
-                restaurant.distance_to_order = f'{round(distance_to_order, 3)} км'
-            else:
-                restaurant.distance_to_order = 'Ошибка геокодера'
+    filters_form = OrdersFilter(request.GET)
+    filters = get_orders_filters(filters_form)
+    page_size = filters['limit'] or ORDERS_PAGE_SIZE
+
+    last_change_seq = OrderChangeCounter.get_last_change_seq()
+    orders_to_show = list(
+        filter_orders_page(Order.objects.all(), filters)
+        .prefetch_related('items', 'restaurant_distances')[:page_size + 1]
+        .with_available_restaurants()
+    )
+    next_page_url = None
+    if len(orders_to_show) > page_size:
+        orders_to_show = orders_to_show[:page_size]
+        next_page_query = request.GET.copy()
+        next_page_query['cursor'] = encode_orders_cursor(orders_to_show[-1])
+        next_page_url = f'?{next_page_query.urlencode()}'
+    first_page_query = request.GET.copy()
+    first_page_query.pop('cursor', None)
+    changes_query = first_page_query.copy()
+    changes_query.pop('limit', None)
+    add_restaurants_with_distances(orders_to_show)
     return render(request, template_name='order_items.html', context={
-        'order_items': orders_to_show
+        'order_items': orders_to_show,
+        'filters_form': filters_form,
+        'next_page_url': next_page_url,
+        'first_page_url': f'?{first_page_query.urlencode()}',
+        'is_first_page': not filters['cursor'],
+        'board_url': request.get_full_path(),
+        'changes_url': f"{reverse('restaurateur:order_changes')}?{changes_query.urlencode()}",
+        'last_change_seq': last_change_seq,
+        'poll_interval': ORDERS_CHANGES_POLL_INTERVAL,
+    })
+
+
+@user_passes_test(is_manager, login_url='restaurateur:login')
+def view_order_changes(request):
+    try:
+        since = int(request.GET.get('since', ''))
+    except ValueError:
+        return JsonResponse({'error': 'Не указан номер изменения since'}, status=400)
+    filters = {
+        **get_orders_filters(OrdersFilter(request.GET)),
+        'cursor': None,
+    }
+
+    last_change_seq = OrderChangeCounter.get_last_change_seq()
+    changed_order_ids = list(
+        Order.objects
+        .filter(change_seq__gt=since, change_seq__lte=last_change_seq)
+        .order_by('change_seq')
+        .values_list('id', flat=True)[:ORDERS_CHANGES_MAX_COUNT + 1]
+    )
+    if len(changed_order_ids) > ORDERS_CHANGES_MAX_COUNT:
+        return JsonResponse({'reload': True, 'last_change_seq': last_change_seq})
+
+    changed_orders = (
+        filter_orders_page(Order.objects.filter(id__in=changed_order_ids), filters)
+        .prefetch_related('items', 'restaurant_distances')
+        .with_available_restaurants()
+    )
+    add_restaurants_with_distances(changed_orders)
+    board_query = request.GET.copy()
+    board_query.pop('since', None)
+    board_url = f"{reverse('restaurateur:view_orders')}?{board_query.urlencode()}"
+    rows = {
+        order.id: render_to_string(
+            'order_row.html',
+            {'item': order, 'board_url': board_url},
+            request=request,
+        )
+        for order in changed_orders
+    }
+    return JsonResponse({
+        'last_change_seq': last_change_seq,
+        'orders': [
+            {'id': order_id, 'html': rows.get(order_id)}
+            for order_id in changed_order_ids
+        ],
     })
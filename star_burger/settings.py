@@ -11,6 +11,18 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
 YANDEX_GEOCODER_KEY = env('YANDEX_GEOCODER_KEY')
+GEOCODER_MAX_WORKERS = env.int('GEOCODER_MAX_WORKERS', 8)
+GEOCODER_MAX_ATTEMPTS = env.int('GEOCODER_MAX_ATTEMPTS', 5)
+GEOCODER_NEGATIVE_CACHE_TTL = env.int('GEOCODER_NEGATIVE_CACHE_TTL', 24 * 60 * 60)
+GEOCODER_CLAIM_TIMEOUT = env.int('GEOCODER_CLAIM_TIMEOUT', 5 * 60)
+GEOCODER_RETRY_DELAY = env.int('GEOCODER_RETRY_DELAY', 10 * 60)
+DISTANCE_GEODESIC_TOP_K = env.int('DISTANCE_GEODESIC_TOP_K', 3)
+GEOCODER_URL = env('GEOCODER_URL', 'https://geocode-maps.yandex.ru/1.x')
+GEOCODER_TIMEOUT = env.float('GEOCODER_TIMEOUT', 5)
+GEOCODER_MAX_RETRIES = env.int('GEOCODER_MAX_RETRIES', 2)
+GEOCODER_RETRY_BACKOFF = env.float('GEOCODER_RETRY_BACKOFF', 0.2)
+GEOCODER_BREAKER_THRESHOLD = env.int('GEOCODER_BREAKER_THRESHOLD', 5)
+GEOCODER_BREAKER_RESET_TIMEOUT = env.float('GEOCODER_BREAKER_RESET_TIMEOUT', 30)
 
 SECRET_KEY = env('SECRET_KEY')
 DEBUG = env.bool('DEBUG', True)
@@ -96,8 +108,17 @@ WSGI_APPLICATION = 'star_burger.wsgi.application'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 MEDIA_URL = '/media/'
 
+API_SNAPSHOTS_ROOT = env('API_SNAPSHOTS_ROOT', os.path.join(BASE_DIR, 'api_snapshots'))
+
 DATABASES = {'default': dj_database_url.config(conn_max_age=600)}
 
+# Версии кэшей и индексов должны быть общими для всех процессов сайта,
+# поэтому кэш в памяти процесса допустим только в режиме разработки
+if DEBUG:
+    CACHES = {'default': env.dj_cache_url('CACHE_URL', 'locmem://')}
+else:
+    CACHES = {'default': env.dj_cache_url('CACHE_URL')}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',